@@ -0,0 +1,48 @@
+"""add task list indexes
+
+Revision ID: 3c9e7a41d2b8
+Revises: a1807e8dab11
+Create Date: 2026-10-18 10:12:05.214871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e7a41d2b8'
+down_revision: Union[str, Sequence[str], None] = 'a1807e8dab11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    'ix_tasks_owner_id_id': ['owner_id', 'id'],
+    'ix_tasks_owner_id_priority_id': ['owner_id', 'priority', 'id'],
+    'ix_tasks_owner_id_title_id': ['owner_id', 'title', 'id'],
+    'ix_tasks_owner_id_deadline_id': ['owner_id', 'deadline', 'id'],
+    'ix_tasks_owner_id_done_id': ['owner_id', 'done', 'id'],
+    'ix_tasks_owner_id_done_priority_id': ['owner_id', 'done', 'priority', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'tasks', columns, if_not_exists=True)
+    op.create_index(
+        'ix_tasks_owner_id_open_deadline_id', 'tasks', ['owner_id', 'deadline', 'id'],
+        postgresql_where=sa.text('done = false'),
+        # Same predicate as the model, which create_all renders as done = 0 on SQLite.
+        sqlite_where=sa.text('done = 0'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_owner_id_open_deadline_id', table_name='tasks', if_exists=True)
+    for name in reversed(list(INDEXES)):
+        op.drop_index(name, table_name='tasks', if_exists=True)
@@ -0,0 +1,53 @@
+"""cover task list indexes
+
+Revision ID: 7f21d0c5e6a4
+Revises: 3c9e7a41d2b8
+Create Date: 2026-10-18 11:03:47.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f21d0c5e6a4'
+down_revision: Union[str, Sequence[str], None] = '3c9e7a41d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# name: (key columns, included columns, partial index predicate)
+INDEXES = {
+    'ix_tasks_owner_id_id': (['owner_id', 'id'], ['title', 'deadline', 'done', 'priority'], None),
+    'ix_tasks_owner_id_priority_id': (['owner_id', 'priority', 'id'], ['title', 'deadline', 'done'], None),
+    'ix_tasks_owner_id_title_id': (['owner_id', 'title', 'id'], ['deadline', 'done', 'priority'], None),
+    'ix_tasks_owner_id_deadline_id': (['owner_id', 'deadline', 'id'], ['title', 'done', 'priority'], None),
+    'ix_tasks_owner_id_done_id': (['owner_id', 'done', 'id'], ['title', 'deadline', 'priority'], None),
+    'ix_tasks_owner_id_done_priority_id': (['owner_id', 'done', 'priority', 'id'], ['title', 'deadline'], None),
+    'ix_tasks_owner_id_open_deadline_id': (['owner_id', 'deadline', 'id'], ['title', 'done', 'priority'], 'done = false'),
+}
+
+
+def _recreate_indexes(with_include: bool) -> None:
+    for name, (columns, include, where) in INDEXES.items():
+        op.drop_index(name, table_name='tasks', if_exists=True)
+        op.create_index(
+            name, 'tasks', columns,
+            postgresql_include=include if with_include else [],
+            postgresql_where=sa.text(where) if where else None,
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # INCLUDE columns only exist on PostgreSQL; other backends keep the plain indexes.
+    if op.get_bind().dialect.name == 'postgresql':
+        _recreate_indexes(with_include=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        _recreate_indexes(with_include=False)
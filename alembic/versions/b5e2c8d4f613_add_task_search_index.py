@@ -0,0 +1,73 @@
+"""add task search index
+
+Revision ID: b5e2c8d4f613
+Revises: 7f21d0c5e6a4
+Create Date: 2026-10-18 15:42:10.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e2c8d4f613'
+down_revision: Union[str, Sequence[str], None] = '7f21d0c5e6a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same statements as models.TASK_SEARCH_DDL, which only runs for new databases.
+UPGRADE = {
+    'postgresql': [
+        # btree_gin lets owner_id (a plain integer) be a key of the GIN index; needs CREATE privilege.
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        # Rewrites the table to fill the generated column.
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_owner_id_search_vector ON tasks USING gin (owner_id, search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+        "title, description, owner_id, content='tasks', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts(rowid, title, description, owner_id) "
+        "VALUES (new.id, new.title, new.description, new.owner_id); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description, owner_id) "
+        "VALUES ('delete', old.id, old.title, old.description, old.owner_id); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, owner_id ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description, owner_id) "
+        "VALUES ('delete', old.id, old.title, old.description, old.owner_id); "
+        "INSERT INTO tasks_fts(rowid, title, description, owner_id) "
+        "VALUES (new.id, new.title, new.description, new.owner_id); END",
+        # Indexes the rows that existed before the triggers.
+        "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+    ],
+}
+
+DOWNGRADE = {
+    'postgresql': [
+        "DROP INDEX IF EXISTS ix_tasks_owner_id_search_vector",
+        "ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector",
+    ],
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS tasks_fts_insert",
+        "DROP TRIGGER IF EXISTS tasks_fts_delete",
+        "DROP TRIGGER IF EXISTS tasks_fts_update",
+        "DROP TABLE IF EXISTS tasks_fts",
+    ],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in UPGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(sa.text(statement))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(sa.text(statement))
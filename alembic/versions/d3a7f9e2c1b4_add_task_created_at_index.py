@@ -0,0 +1,34 @@
+"""add task created_at index
+
+Revision ID: d3a7f9e2c1b4
+Revises: b5e2c8d4f613
+Create Date: 2026-10-18 17:20:36.774915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a7f9e2c1b4'
+down_revision: Union[str, Sequence[str], None] = 'b5e2c8d4f613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves the created_after/created_before list filters; deadline and priority
+    # ranges already have their (owner_id, column, id) indexes.
+    op.create_index(
+        'ix_tasks_owner_id_created_at_id', 'tasks', ['owner_id', 'created_at', 'id'],
+        postgresql_include=['title', 'deadline', 'done', 'priority'],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_owner_id_created_at_id', table_name='tasks', if_exists=True)
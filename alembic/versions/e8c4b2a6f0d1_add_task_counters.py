@@ -0,0 +1,47 @@
+"""add task counters
+
+Revision ID: e8c4b2a6f0d1
+Revises: d3a7f9e2c1b4
+Create Date: 2026-10-18 18:05:12.402871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4b2a6f0d1'
+down_revision: Union[str, Sequence[str], None] = 'd3a7f9e2c1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled by `python -m app.maintenance rebuild-task-counters`, which buckets
+    # completion times in Python; the tables are unused while TASK_COUNTERS_ENABLED is off.
+    op.create_table(
+        'task_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('priority', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('done', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'priority'),
+    )
+    op.create_table(
+        'task_completion_buckets',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('completed', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'bucket'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('task_completion_buckets')
+    op.drop_table('task_counters')
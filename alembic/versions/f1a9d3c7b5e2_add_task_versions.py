@@ -0,0 +1,36 @@
+"""add task versions
+
+Revision ID: f1a9d3c7b5e2
+Revises: e8c4b2a6f0d1
+Create Date: 2026-10-18 19:12:47.118530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a9d3c7b5e2'
+down_revision: Union[str, Sequence[str], None] = 'e8c4b2a6f0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('tasks_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('tasks', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    # The model fills updated_at from the INSERT (SQLite cannot add a column with a
+    # CURRENT_TIMESTAMP default), so existing rows start from their creation time.
+    op.add_column('tasks', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute('UPDATE tasks SET updated_at = created_at')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Plain DROP COLUMN (SQLite 3.35+): a batch table copy would lose the tasks_fts triggers.
+    op.drop_column('tasks', 'updated_at')
+    op.drop_column('tasks', 'version')
+    op.drop_column('users', 'tasks_version')
@@ -1,5 +1,14 @@
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict, Field
+from pydantic import ConfigDict, Field, field_validator, model_validator
+from typing import Literal
+
+# argon2id cost profiles: time_cost (iterations), memory_cost (KiB), parallelism (lanes).
+# 'low' is the OWASP minimum, 'default' matches PasswordHash.recommended().
+DEFAULT_ARGON2_PROFILES = {
+    'low': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+    'default': {'time_cost': 3, 'memory_cost': 65536, 'parallelism': 4},
+    'high': {'time_cost': 4, 'memory_cost': 131072, 'parallelism': 4},
+}
 
 class Settings(BaseSettings):
     model_config = ConfigDict(env_file='.env', extra='allow')
@@ -8,6 +17,61 @@ class Settings(BaseSettings):
     ALGORITHM: str = Field(default='HS256')
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30)
     REFRESH_TOKEN_EXPIRE_DAYS: int = Field(default=30)
+    # Trust the user claims of access tokens instead of loading the user row on every request.
+    STATELESS_AUTH: bool = Field(default=False)
+    # In-process cache of authenticated users; size 0 disables it.
+    USER_CACHE_SIZE: int = Field(default=10000, ge=0)
+    USER_CACHE_TTL_SECONDS: float = Field(default=30)
+    # Verified JWT payloads, kept until the token expires; size 0 disables it.
+    TOKEN_CACHE_SIZE: int = Field(default=10000, ge=0)
+    TASK_BATCH_MAX_OPERATIONS: int = Field(default=500)
+    # Rows fetched from the server-side cursor per chunk of /user/tasks/export.
+    TASK_EXPORT_BATCH_SIZE: int = Field(default=1000, ge=1)
+    # Keep per-user task counters on every task write and serve /user/tasks/stats from them.
+    # Fill them with `python -m app.maintenance rebuild-task-counters` before turning this on.
+    TASK_COUNTERS_ENABLED: bool = Field(default=False)
+    # Deleted tasks are reported by /user/tasks/changes for this long, see app.maintenance.
+    TASK_TOMBSTONE_RETENTION_DAYS: float = Field(default=30, gt=0)
+    # Off only for load tests, which log in and register far above the limits.
+    RATE_LIMIT_ENABLED: bool = Field(default=True)
+
+    # Per-request SQL instrumentation: X-DB-* response headers and warning thresholds.
+    DB_STATS_HEADERS: bool = Field(default=False)
+    DB_MAX_STATEMENTS_PER_REQUEST: int = Field(default=20)
+    DB_REPEATED_STATEMENT_THRESHOLD: int = Field(default=5)
+    DB_SLOW_STATEMENT_MS: float = Field(default=200)
+
+    # Prometheus text metrics on /metrics; errors go to Sentry when a DSN is set.
+    METRICS_ENABLED: bool = Field(default=True)
+    SENTRY_DSN: str | None = Field(default=None)
+    SENTRY_TRACES_SAMPLE_RATE: float = Field(default=0.0)
+
+    # Password hashing runs in a worker pool; 0 workers hashes inline on the event loop.
+    HASH_POOL_KIND: Literal['thread', 'process'] = Field(default='thread')
+    HASH_POOL_WORKERS: int = Field(default=4, ge=0)
+    HASH_POOL_QUEUE_SIZE: int = Field(default=64, ge=0)
+
+    # New hashes use ARGON2_PROFILE; hashes made with other parameters are upgraded on login.
+    ARGON2_PROFILE: str = Field(default='default')
+    ARGON2_PROFILES: dict[str, dict[str, int]] = Field(default_factory=lambda: dict(DEFAULT_ARGON2_PROFILES))
+
+    @field_validator('ARGON2_PROFILES')
+    @classmethod
+    def merge_argon2_profiles(cls, profiles: dict[str, dict[str, int]]) -> dict[str, dict[str, int]]:
+        # Profiles from the environment add to or override the built-in ones, parameter by parameter.
+        merged = {name: dict(params) for name, params in DEFAULT_ARGON2_PROFILES.items()}
+        for name, params in profiles.items():
+            merged[name] = {**merged.get(name, {}), **params}
+        return merged
+
+    @model_validator(mode='after')
+    def check_argon2_profile(self):
+        if self.ARGON2_PROFILE not in self.ARGON2_PROFILES:
+            raise ValueError(f'ARGON2_PROFILE {self.ARGON2_PROFILE!r} is not one of the ARGON2_PROFILES: {", ".join(self.ARGON2_PROFILES)}.')
+        return self
+
+    def argon2_params(self, profile: str | None = None) -> dict[str, int]:
+        return self.ARGON2_PROFILES[profile or self.ARGON2_PROFILE]
 
 class SettingsDataBase(BaseSettings):
     model_config = ConfigDict(env_file='.env', extra='allow')
@@ -17,12 +81,27 @@ class SettingsDataBase(BaseSettings):
     HOST: str = Field(default='localhost')
     PORT:str = Field(default='5432')
     NAME:str = Field(default='todo_list')
+    # Full SQLAlchemy URL; overrides the parts above when set.
+    DATABASE_URL: str | None = Field(default=None)
+
+    # Engine and pool tuning, see database.create_engine.
+    ECHO_SQL: bool = Field(default=False)
+    POOL_SIZE: int = Field(default=5, ge=1)
+    MAX_OVERFLOW: int = Field(default=10, ge=0)
+    POOL_TIMEOUT: float = Field(default=30)
+    POOL_PRE_PING: bool = Field(default=True)
+    POOL_RECYCLE: int = Field(default=1800)
+    STATEMENT_CACHE_SIZE: int = Field(default=100, ge=0)
+
+    # Read-only queries go to these replicas (JSON list of URLs) when any are set.
+    REPLICA_URLS: list[str] = Field(default_factory=list)
+    REPLICA_EJECT_SECONDS: float = Field(default=30)
+    # A user reads from the primary for this long after their last write.
+    READ_YOUR_WRITES_SECONDS: float = Field(default=5)
 
 
 settings = Settings()
 settings_db = SettingsDataBase()
 
-DATABASE_URL = f'postgresql+asyncpg://{settings_db.USER}:{settings_db.PASSWORD}@{settings_db.HOST}:{settings_db.PORT}/{settings_db.NAME}'
-
-ECHO_SQL = True
+DATABASE_URL = settings_db.DATABASE_URL or f'postgresql+asyncpg://{settings_db.USER}:{settings_db.PASSWORD}@{settings_db.HOST}:{settings_db.PORT}/{settings_db.NAME}'
 
@@ -25,6 +25,15 @@ class InvalidDataError(HTTPException):
 
 # Auth Errors
 
+class ServiceUnavailableError(HTTPException):
+    def __init__(self, message: str = 'Service is temporarily overloaded, please retry later.'):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=message,
+            headers={'Retry-After': '1'}
+        )
+
+
 class InvalidCredentialsError(HTTPException):
     def __init__(self):
         super().__init__(
@@ -87,4 +96,11 @@ class TaskAccessDeniedError(HTTPException):
         super().__init__(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to modify this task."
-        )
\ No newline at end of file
+        )
+
+class SyncTokenExpiredError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_410_GONE,
+            detail='Sync token is older than the kept deletions; sync again without a token.'
+        )
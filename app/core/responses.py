@@ -0,0 +1,26 @@
+import orjson
+from fastapi import Request, Response, responses, status
+
+
+class ORJSONResponse(responses.ORJSONResponse):
+    """The app's default response class.
+
+    OPT_UTC_Z writes UTC datetimes with a Z suffix like Pydantic's JSON mode, so
+    plain dicts and lists rendered here match what the response_model path produces.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists the ETag, compared weakly as GET requests are."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag.removeprefix('W/') for tag in header.split(','))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
@@ -1,26 +1,132 @@
-from sqlalchemy import select, delete
+import math
+import re
+from collections import defaultdict
+from fastapi import HTTPException, status
+from sqlalchemy import Row, and_, case, column, extract, false, func, insert, literal, literal_column, or_, select, table, true, tuple_, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime      
+from datetime import datetime
+from typing import AsyncIterator, Sequence
 
-from app.database.models import User, Task
-from app.schemas.schemas import TaskCreate, UserCreate
-from app.core.exceptions import ObjectNotFoundError, InvalidDataError, UserNotFoundError
+from app.database.database import replica_router
+from app.database.models import User, Task, TaskCompletionBucket, TaskCounter, TaskTombstone
+from app.schemas.schemas import TaskCreate, TaskFilter, TaskRead, UserCreate
+from app.crud.pagination import decode_cursor, decode_sync_token, encode_cursor, encode_sync_token
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.core.exceptions import ObjectNotFoundError, InvalidDataError, SyncTokenExpiredError, UserNotFoundError, TaskNotFoundError, TaskAccessDeniedError
 # from app.security.security import get_password_hash
 
 
 # --- Task CRUD  ---
+# Columns of the TaskSummary projection; every list index covers them.
+TASK_SUMMARY_COLUMNS = (Task.id, Task.title, Task.deadline, Task.done)
+# Columns written by the export, a TaskRead without the owner.
+TASK_EXPORT_COLUMNS = (Task.id, Task.title, Task.description, Task.deadline, Task.priority,
+                       Task.created_at, Task.done, Task.completed_at)
+# Columns the task counters are computed from.
+TASK_COUNTED_COLUMNS = (Task.priority, Task.done, Task.created_at, Task.completed_at)
+
+
 async def create_task(db: AsyncSession, task_data: TaskCreate, user_id: int) -> Task:
     if not task_data.title:
         raise InvalidDataError('Task title cannot be empty.')
-    new_task = Task(
-        **task_data.model_dump(),
-        owner_id = user_id)
-    
-    db.add(new_task)
+    change_seq = await _bump_tasks_version(db, user_id)
+    # INSERT ... RETURNING fills id and created_at, so no refresh is needed after commit.
+    new_task, = await _insert_tasks(db, [task_data], user_id, [change_seq])
     await db.commit()
-    await db.refresh(new_task)
+    replica_router.mark_write(user_id)
     return new_task
 
+def _keyset_condition(column, sort_key, last_id: int, descending: bool):
+    """The rows after (sort_key, last_id) as one index range: a row-value comparison both
+    SQLite and PostgreSQL seek on, where an OR of the same terms only seeks on owner_id.
+
+    NULL deadlines sort last in ascending order and first in descending order, matching the
+    default NULL placement of a btree index. They are a range of their own, so the rows on
+    the other side of them are read by _keyset_next_range once this range runs out.
+    """
+    if column is Task.id:
+        return Task.id < last_id if descending else Task.id > last_id
+    if sort_key is None:
+        return and_(column.is_(None), Task.id < last_id if descending else Task.id > last_id)
+    position = tuple_(column, Task.id)
+    bound = tuple_(literal(sort_key, column.type), literal(last_id))
+    return position < bound if descending else position > bound
+
+def _keyset_next_range(column, sort_key, descending: bool):
+    """The NULL or non-NULL deadlines that follow the keyset range, or None when nothing does."""
+    if descending and sort_key is None:
+        return column.is_not(None)
+    if not descending and sort_key is not None and column is Task.deadline:
+        return column.is_(None)
+    return None
+
+def _filter_tasks(query, status_filter: bool | None, priority_filter: int | None, filters: TaskFilter | None = None):
+    """The list filters, shared by the list page and the export."""
+    if status_filter is not None:
+        query = query.where(Task.done == status_filter)
+    if priority_filter is not None:
+        query = query.where(Task.priority == priority_filter)
+    if filters is None:
+        return query
+
+    bounds = (
+        (Task.deadline >= filters.deadline_after) if filters.deadline_after is not None else None,
+        (Task.deadline < filters.deadline_before) if filters.deadline_before is not None else None,
+        (Task.created_at >= filters.created_after) if filters.created_after is not None else None,
+        (Task.created_at < filters.created_before) if filters.created_before is not None else None,
+        (Task.priority >= filters.priority_min) if filters.priority_min is not None else None,
+        (Task.priority <= filters.priority_max) if filters.priority_max is not None else None,
+    )
+    query = query.where(*(bound for bound in bounds if bound is not None))
+
+    # done is compared with a literal false so the partial open-deadline index applies.
+    now = datetime.now()
+    if filters.overdue:
+        query = query.where(Task.done == false(), Task.deadline < now)
+    elif filters.overdue is False:
+        query = query.where(or_(Task.done == true(), Task.deadline.is_(None), Task.deadline >= now))
+    return query
+
+def _order_tasks(query, sort_by: str, descending: bool):
+    sort_column = getattr(Task, sort_by)
+    if descending:
+        order = sort_column.desc().nulls_first() if sort_by == 'deadline' else sort_column.desc()
+        return query.order_by(order, Task.id.desc())
+    order = sort_column.asc().nulls_last() if sort_by == 'deadline' else sort_column.asc()
+    return query.order_by(order, Task.id.asc())
+
+def _search_condition(query, dialect: str, user_id: int, terms: list[str]):
+    """Restricts the query to tasks whose title or description contain all terms, best match first."""
+    if dialect == 'postgresql':
+        search_vector = literal_column('tasks.search_vector', TSVECTOR)
+        ts_query = func.plainto_tsquery('simple', ' '.join(terms))
+        return query.where(search_vector.op('@@')(ts_query)).order_by(func.ts_rank_cd(search_vector, ts_query).desc(), Task.id)
+
+    if dialect == 'sqlite':
+        # Terms are quoted, so FTS5 query syntax in the user's input is matched literally.
+        phrases = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        match = f'owner_id : "{user_id}" AND {{title description}} : ({phrases})'
+        tasks_fts = table('tasks_fts', column('rowid'))
+        # FTS5's bm25 counts every row holding each phrase, including all of the owner's
+        # rows, so matches are ranked by where the terms occur instead: title hits first.
+        # unicode_lower is registered on every SQLite connection (see models), lower() is ASCII-only.
+        score = sum(
+            case((func.instr(func.unicode_lower(Task.title), term) > 0, 2), else_=0)
+            + case((func.instr(func.unicode_lower(func.coalesce(Task.description, '')), term) > 0, 1), else_=0)
+            for term in terms
+        )
+        return (query.join(tasks_fts, tasks_fts.c.rowid == Task.id)
+                .where(literal_column('tasks_fts').op('MATCH')(match))
+                .order_by(score.desc(), Task.id))
+
+    for term in terms:
+        query = query.where(or_(Task.title.icontains(term, autoescape=True), Task.description.icontains(term, autoescape=True)))
+    return query.order_by(Task.id)
+
 async def get_list_tasks_titles(db: AsyncSession, 
                                 user_id: int, 
                                 offset:int, 
@@ -28,30 +134,95 @@ async def get_list_tasks_titles(db: AsyncSession,
                                 sort_by: str, 
                                 status_filter: bool | None = None,
                                 priority_filter: int | None = None,
-                                sort_order: str = 'asc'
-                                ) -> list[dict]:
+                                sort_order: str = 'asc',
+                                cursor: str | None = None,
+                                search: str | None = None,
+                                filters: TaskFilter | None = None
+                                ) -> tuple[list[dict], str | None]:
+    """Returns a page of task summaries and the cursor of the next page.
+
+    With a cursor the page starts right after the row it points to (keyset pagination)
+    and the offset is ignored, so deep pages cost the same as the first one.
+    A search ranks the matches by relevance instead of sorting them and only pages by offset.
+    """
     
+    if search is not None:
+        if cursor is not None:
+            raise InvalidDataError('Search results are paginated by page, not by cursor.')
+        terms = re.findall(r'\w+', search.lower())
+        if not terms:
+            return [], None
+        query = select(*TASK_SUMMARY_COLUMNS).where(Task.owner_id==user_id)
+        query = _filter_tasks(query, status_filter, priority_filter, filters)
+        query = _search_condition(query, db.get_bind().dialect.name, user_id, terms)
+        rows = (await db.execute(query.offset(offset).limit(limit))).all()
+        return [dict(id=row.id, title=row.title, deadline=row.deadline, done=row.done) for row in rows], None
+
     if not hasattr(Task, sort_by):
         raise ValueError(f"Invalid sort field: {sort_by}")
     
-    query = select(Task.id, Task.title, Task.deadline, Task.done).where(Task.owner_id==user_id)
-    
-    if status_filter is not None:
-        query = query.where(Task.done == status_filter)
-    if priority_filter is not None:
-        query = query.where(Task.priority == priority_filter)
+    sort_column = getattr(Task, sort_by)
+    sort_order = 'desc' if sort_order == 'desc' else 'asc'
+    descending = sort_order == 'desc'
 
-    if sort_order == 'desc':
-        query = query.order_by(getattr(Task, sort_by).desc())
-    else: 
-        query = query.order_by(getattr(Task, sort_by).asc())
+    query = select(*TASK_SUMMARY_COLUMNS, sort_column.label('sort_key')).where(Task.owner_id==user_id)
+    query = _filter_tasks(query, status_filter, priority_filter, filters)
 
-    query = query.offset(offset).limit(limit)
-    
+    next_range = None
+    if cursor is not None:
+        sort_key, last_id = decode_cursor(cursor, sort_by, sort_order)
+        next_range = _keyset_next_range(sort_column, sort_key, descending)
+        rows = (await db.execute(_order_tasks(
+            query.where(_keyset_condition(sort_column, sort_key, last_id, descending)), sort_by, descending).limit(limit))).all()
+    else:
+        rows = (await db.execute(_order_tasks(query, sort_by, descending).offset(offset).limit(limit))).all()
+
+    if next_range is not None and len(rows) < limit:
+        rows += (await db.execute(_order_tasks(query.where(next_range), sort_by, descending).limit(limit - len(rows)))).all()
 
-    tasks = await db.execute(query) 
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(sort_by, sort_order, rows[-1].sort_key, rows[-1].id)
     
-    return [dict(task._mapping) for task in tasks]
+    return [dict(id=row.id, title=row.title, deadline=row.deadline, done=row.done) for row in rows], next_cursor
+
+async def stream_task_batches(db: AsyncSession,
+                              user_id: int,
+                              sort_by: str = 'id',
+                              status_filter: bool | None = None,
+                              priority_filter: int | None = None,
+                              sort_order: str = 'asc',
+                              batch_size: int = 1000,
+                              filters: TaskFilter | None = None
+                              ) -> AsyncIterator[Sequence[Row]]:
+    """Yields all of the user's matching tasks in batches of rows, read through a server-side cursor.
+
+    Plain column rows are fetched instead of Task objects, so nothing piles up in the
+    session's identity map and memory stays at one batch however big the account is.
+    """
+    if not hasattr(Task, sort_by):
+        raise ValueError(f"Invalid sort field: {sort_by}")
+
+    query = select(*TASK_EXPORT_COLUMNS).where(Task.owner_id==user_id)
+    query = _filter_tasks(query, status_filter, priority_filter, filters)
+    query = _order_tasks(query, sort_by, sort_order == 'desc').execution_options(yield_per=batch_size)
+
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        yield rows
+
+async def get_tasks_version(db: AsyncSession, user_id: int) -> int | None:
+    """The user's task change counter, read from the users primary key without touching the tasks."""
+    return await db.scalar(select(User.tasks_version).where(User.id==user_id))
+
+async def _bump_tasks_version(db: AsyncSession, user_id: int, changes: int = 1) -> int | None:
+    """Reserves change_seq values tasks_version - changes + 1 .. tasks_version for the user's next writes.
+
+    Runs before the task statements and holds the users row lock until commit, so writes of
+    one user take their change_seq values and become visible in the same order.
+    """
+    return await db.scalar(
+        update(User).where(User.id==user_id).values(tasks_version=User.tasks_version + changes).returning(User.tasks_version))
 
 async def get_one_task(db: AsyncSession, task_id:int) -> Task:
     task = await db.scalar(select(Task).where(Task.id==task_id))
@@ -59,39 +230,374 @@ async def get_one_task(db: AsyncSession, task_id:int) -> Task:
         raise ObjectNotFoundError('Task')
     return task
 
-async def update_task(db: AsyncSession, task_id: int, data: dict) -> Task:
-    task = await db.scalar(select(Task).where(Task.id==task_id))
+async def _raise_task_not_owned(db: AsyncSession, task_id: int):
+    """Tells a missing task from someone else's after an ownership-checked write matched nothing."""
+    owner_id = await db.scalar(select(Task.owner_id).where(Task.id==task_id))
+    if owner_id is None:
+        raise TaskNotFoundError()
+    raise TaskAccessDeniedError()
 
-    if not task:
-        raise ObjectNotFoundError('Task')
-    
+async def _update_owned_task(db: AsyncSession, task_id: int, data: dict, user_id: int, change_seq: int) -> Task:
     if not data:
         raise InvalidDataError('Update data cannot be empty.')
     
-    for key, value in data.items():
-        if value:
-            setattr(task, key, value)
-            if key == 'done':
-                task.completed_at = datetime.now()
+    values = {key: value for key, value in data.items() if value}
+    if 'done' in values:
+        values['completed_at'] = datetime.now()
+    if values:
+        values.update(version=Task.version + 1, updated_at=func.now(), change_seq=change_seq)
 
+    owned_task = (Task.id==task_id, Task.owner_id==user_id)
+    # Only a change of done or priority moves the task between counters.
+    previous = None
+    if settings.TASK_COUNTERS_ENABLED and ('done' in values or 'priority' in values):
+        previous = (await db.execute(select(*TASK_COUNTED_COLUMNS).where(*owned_task).with_for_update())).first()
+
+    if values:
+        query = update(Task).where(*owned_task).values(**values).returning(Task)
+    else:
+        query = select(Task).where(*owned_task)
+
+    task = await db.scalar(query)
+    if not task:
+        await _raise_task_not_owned(db, task_id)
+    if previous is not None:
+        await _count_tasks(db, user_id, removed=[previous], added=[task])
+    return task
 
+async def update_task(db: AsyncSession, task_id: int, data: dict, user_id: int) -> Task:
+    """Updates a task of the user with a single UPDATE ... RETURNING statement and counts the change in tasks_version."""
+    change_seq = await _bump_tasks_version(db, user_id)
+    task = await _update_owned_task(db, task_id, data, user_id, change_seq)
     await db.commit()
-    await db.refresh(task)
+    replica_router.mark_write(user_id)
     return task
 
-async def delete_task(db:AsyncSession, task_id: int) -> bool:
-    result = await db.execute(delete(Task).where(Task.id==task_id))
+async def _delete_owned_task(db: AsyncSession, task_id: int, user_id: int, change_seq: int) -> None:
+    deleted = (await db.execute(
+        delete(Task).where(Task.id==task_id, Task.owner_id==user_id).returning(Task.id, *TASK_COUNTED_COLUMNS))).first()
+    if deleted is None:
+        await _raise_task_not_owned(db, task_id)
+    await db.execute(insert(TaskTombstone).values(task_id=task_id, owner_id=user_id, change_seq=change_seq))
+    await _count_tasks(db, user_id, removed=[deleted])
+
+async def delete_task(db:AsyncSession, task_id: int, user_id: int) -> bool:
+    """Deletes a task of the user with a single DELETE ... RETURNING statement and counts the change in tasks_version."""
+    change_seq = await _bump_tasks_version(db, user_id)
+    await _delete_owned_task(db, task_id, user_id, change_seq)
     await db.commit()
-    return result.rowcount > 0
+    replica_router.mark_write(user_id)
+    return True
+
+async def _insert_tasks(db: AsyncSession, tasks_data: list[TaskCreate], user_id: int, change_seqs: list[int]) -> list[Task]:
+    """Inserts tasks with one multi-row INSERT ... RETURNING, keeping the input order."""
+    tasks = await db.scalars(
+        insert(Task).returning(Task, sort_by_parameter_order=True),
+        [dict(**task_data.model_dump(), owner_id=user_id, change_seq=change_seq)
+         for task_data, change_seq in zip(tasks_data, change_seqs)])
+    tasks = list(tasks)
+    await _count_tasks(db, user_id, added=tasks)
+    return tasks
+
+async def apply_task_batch(db: AsyncSession, operations: list, user_id: int, atomic: bool) -> tuple[list[dict], bool]:
+    """Applies create/update/delete operations of one user in a single transaction.
+
+    Creates run first as one multi-row INSERT, then updates and deletes in request order.
+    In atomic mode the first failure rolls the whole batch back; in best-effort mode
+    each step runs in its own savepoint and failures are only reported.
+    Returns per-operation results (in request order) and whether anything was committed.
+    """
+    results: dict[int, dict] = {}
+    # Operation i is recorded as change first_seq + i.
+    first_seq = await _bump_tasks_version(db, user_id, len(operations)) - len(operations) + 1
 
+    def batch_failed() -> bool:
+        return any(result['status_code'] >= 400 for result in results.values())
+
+    async def run(indexes: list[int], action):
+        try:
+            if atomic:
+                return await action()
+            async with db.begin_nested():
+                return await action()
+        except HTTPException as exc:
+            status_code, detail = exc.status_code, exc.detail
+        except SQLAlchemyError:
+            status_code, detail = status.HTTP_422_UNPROCESSABLE_CONTENT, 'Operation was rejected by the database.'
+        for index in indexes:
+            results[index] = dict(index=index, op=operations[index].op, status_code=status_code, detail=detail)
+
+    creates = []
+    for index, operation in enumerate(operations):
+        if operation.op != 'create':
+            continue
+        if not operation.data.title:
+            results[index] = dict(index=index, op='create', status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                                  detail='Task title cannot be empty.')
+        else:
+            creates.append(index)
+
+    if creates and not (atomic and batch_failed()):
+        tasks = await run(creates, lambda: _insert_tasks(db, [operations[i].data for i in creates], user_id,
+                                                            [first_seq + i for i in creates]))
+        for index, task in zip(creates, tasks or []):
+            results[index] = dict(index=index, op='create', status_code=status.HTTP_201_CREATED,
+                                  id=task.id, task=TaskRead.model_validate(task))
+
+    for index, operation in enumerate(operations):
+        if atomic and batch_failed():
+            break
+        if operation.op == 'create':
+            continue
+        if operation.op == 'update':
+            task = await run([index], lambda: _update_owned_task(db, operation.id, operation.data.model_dump(), user_id,
+                                                                first_seq + index))
+            if task:
+                results[index] = dict(index=index, op='update', status_code=status.HTTP_200_OK,
+                                      id=task.id, task=TaskRead.model_validate(task))
+        else:
+            await run([index], lambda: _delete_owned_task(db, operation.id, user_id, first_seq + index))
+            results.setdefault(index, dict(index=index, op='delete', status_code=status.HTTP_204_NO_CONTENT, id=operation.id))
+
+    if atomic and batch_failed():
+        await db.rollback()
+        for index, operation in enumerate(operations):
+            if index not in results or results[index]['status_code'] < 400:
+                results[index] = dict(index=index, op=operation.op, status_code=status.HTTP_424_FAILED_DEPENDENCY,
+                                      detail='Not applied: another operation in the batch failed.')
+        return [results[index] for index in range(len(operations))], False
+
+    await db.commit()
+    replica_router.mark_write(user_id)
+    return [results[index] for index in range(len(operations))], True
+
+
+# --- Task stats ---
+# Time-to-complete is counted in quarter-octave buckets: bucket b holds the tasks done in
+# d seconds with 2^(b/4) <= d + 1 < 2^((b+1)/4), so a duration read back from them is off by less than 19%.
+COMPLETION_BUCKETS_PER_OCTAVE = 4
+
+def completion_bucket(seconds: float) -> int:
+    return int(COMPLETION_BUCKETS_PER_OCTAVE * math.log2(max(seconds, 0) + 1))
+
+def _bucket_median(buckets: dict[int, int]) -> float | None:
+    """The median duration, interpolated geometrically inside the bucket it falls in."""
+    buckets = {bucket: count for bucket, count in buckets.items() if count > 0}
+    half = sum(buckets.values()) / 2
+    seen = 0
+    for bucket in sorted(buckets):
+        count = buckets[bucket]
+        if seen + count >= half:
+            position = (bucket + (half - seen) / count) / COMPLETION_BUCKETS_PER_OCTAVE
+            return 2 ** position - 1
+        seen += count
+    return None
+
+def _completion_seconds(task) -> float | None:
+    if not task.done or task.completed_at is None or task.created_at is None:
+        return None
+    return (task.completed_at - task.created_at).total_seconds()
+
+async def _add_counts(db: AsyncSession, model, rows: list[dict], keys: tuple[str, ...], counts: tuple[str, ...]):
+    """Adds the counts of the rows to the existing ones with one INSERT ... ON CONFLICT DO UPDATE."""
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    statement = dialect_insert(model).values(rows)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: getattr(model, name) + statement.excluded[name] for name in counts}))
+
+async def _count_tasks(db: AsyncSession, user_id: int, removed: Sequence = (), added: Sequence = ()):
+    """Applies deleted (removed), created (added) and changed (both) tasks to the user's counters."""
+    if not settings.TASK_COUNTERS_ENABLED:
+        return
+
+    totals = defaultdict(lambda: [0, 0])
+    buckets = defaultdict(int)
+    for sign, tasks in ((-1, removed), (1, added)):
+        for task in tasks:
+            counts = totals[task.priority or 0]
+            counts[0] += sign
+            counts[1] += sign * bool(task.done)
+            seconds = _completion_seconds(task)
+            if seconds is not None:
+                buckets[completion_bucket(seconds)] += sign
+
+    counters = [dict(user_id=user_id, priority=priority, total=total, done=done)
+                for priority, (total, done) in totals.items() if total or done]
+    if counters:
+        await _add_counts(db, TaskCounter, counters, ('user_id', 'priority'), ('total', 'done'))
+    completions = [dict(user_id=user_id, bucket=bucket, completed=completed)
+                   for bucket, completed in buckets.items() if completed]
+    if completions:
+        await _add_counts(db, TaskCompletionBucket, completions, ('user_id', 'bucket'), ('completed',))
+
+def _median_completion_seconds(dialect: str, user_id: int):
+    """Scalar subquery: the exact median of completed_at - created_at over the user's done tasks."""
+    completed = (Task.owner_id==user_id, Task.done == true(), Task.completed_at.is_not(None))
+    if dialect == 'postgresql':
+        seconds = extract('epoch', Task.completed_at - Task.created_at)
+        return select(func.percentile_cont(0.5).within_group(seconds)).where(*completed).scalar_subquery()
+
+    # Without percentile functions: the average of the one or two middle durations.
+    seconds = (func.julianday(Task.completed_at) - func.julianday(Task.created_at)) * 86400
+    count = select(func.count()).where(*completed).scalar_subquery()
+    middle = (select(seconds.label('seconds')).where(*completed).order_by(seconds)
+              .limit(2 - count % 2).offset((count - 1) // 2).subquery())
+    return select(func.avg(middle.c.seconds)).scalar_subquery()
+
+async def get_task_stats(db: AsyncSession, user_id: int) -> dict:
+    """Counts of the user's tasks by state and priority, completion rate and median time-to-complete.
+
+    With TASK_COUNTERS_ENABLED the counts come from the task counters and the median is
+    estimated from the completion buckets, so the cost does not depend on the number of tasks
+    (overdue tasks are still counted, through the partial open-deadline index).
+    Otherwise everything is computed by one query grouped by priority.
+    """
+    overdue = and_(Task.done == false(), Task.deadline < datetime.now())
+
+    if settings.TASK_COUNTERS_ENABLED:
+        overdue_count = select(func.count()).where(Task.owner_id==user_id, overdue).scalar_subquery()
+        rows = (await db.execute(
+            select(TaskCounter.priority, TaskCounter.total, TaskCounter.done, overdue_count.label('overdue'))
+            .where(TaskCounter.user_id==user_id, TaskCounter.total > 0))).all()
+        buckets = await db.execute(
+            select(TaskCompletionBucket.bucket, TaskCompletionBucket.completed).where(TaskCompletionBucket.user_id==user_id))
+        overdue_total = rows[0].overdue if rows else 0
+        median = _bucket_median(dict(buckets.all()))
+    else:
+        priority = func.coalesce(Task.priority, 0)
+        rows = (await db.execute(
+            select(
+                priority.label('priority'),
+                func.count().label('total'),
+                func.count(case((Task.done == true(), 1))).label('done'),
+                func.count(case((overdue, 1))).label('overdue'),
+                _median_completion_seconds(db.get_bind().dialect.name, user_id).label('median'),
+            ).where(Task.owner_id==user_id).group_by(priority))).all()
+        overdue_total = sum(row.overdue for row in rows)
+        median = rows[0].median if rows else None
+
+    total = sum(row.total for row in rows)
+    done = sum(row.done for row in rows)
+    return dict(
+        total=total,
+        open=total - done,
+        done=done,
+        overdue=overdue_total,
+        by_priority={row.priority: row.total for row in sorted(rows, key=lambda row: row.priority)},
+        completion_rate=done / total if total else None,
+        median_completion_seconds=float(median) if median is not None else None,
+    )
+
+async def rebuild_task_counters(db: AsyncSession, user_id: int | None = None):
+    """Recomputes the task counters of one user, or of everyone, from their tasks."""
+    owner = (Task.owner_id==user_id,) if user_id is not None else ()
+    await db.execute(delete(TaskCounter).where(*((TaskCounter.user_id==user_id,) if owner else ())))
+    await db.execute(delete(TaskCompletionBucket).where(*((TaskCompletionBucket.user_id==user_id,) if owner else ())))
+
+    priority = func.coalesce(Task.priority, 0)
+    await db.execute(insert(TaskCounter).from_select(
+        ['user_id', 'priority', 'total', 'done'],
+        select(Task.owner_id, priority, func.count(), func.count(case((Task.done == true(), 1))))
+        .where(*owner).group_by(Task.owner_id, priority)))
+
+    # Buckets are computed here rather than in SQL, which has no portable log2.
+    buckets = defaultdict(int)
+    result = await db.stream(select(Task.owner_id, *TASK_COUNTED_COLUMNS)
+                             .where(*owner, Task.done == true()).execution_options(yield_per=10000))
+    async for rows in result.partitions():
+        for row in rows:
+            seconds = _completion_seconds(row)
+            if seconds is not None:
+                buckets[row.owner_id, completion_bucket(seconds)] += 1
+    if buckets:
+        await db.execute(insert(TaskCompletionBucket), [
+            dict(user_id=owner_id, bucket=bucket, completed=completed) for (owner_id, bucket), completed in buckets.items()])
+    await db.commit()
+
+
+# --- Task delta sync ---
+def _after_change(change_seq_column, id_column, change_seq: int, last_id: int | None):
+    if last_id is None:
+        return change_seq_column > change_seq
+    # The redundant change_seq >= bound lets a mid-page token seek in the index; the OR alone
+    # only seeks on owner_id.
+    return and_(change_seq_column >= change_seq,
+                or_(change_seq_column > change_seq, and_(change_seq_column == change_seq, id_column > last_id)))
+
+async def get_task_changes(db: AsyncSession, user_id: int, since: str | None, limit: int) -> dict:
+    """Tasks written and deleted after the sync token, oldest change first, and the token to continue from.
+
+    Without a token every task is returned (and no deletions), up to the tasks_version read
+    when the full sync started. Tasks and tombstones are read by (owner_id, change_seq) index
+    range scans, and when nothing changed since the token only the users row is read.
+    """
+    versions = (await db.execute(
+        select(User.tasks_version, User.tombstones_compacted_seq).where(User.id==user_id))).one()
+
+    if since is None:
+        change_seq, last_id, full_sync_until = -1, None, versions.tasks_version
+    else:
+        change_seq, last_id, full_sync_until = decode_sync_token(since)
+    full_sync = full_sync_until is not None
+    # Writes committed after the users row was read have a higher change_seq; the scans stop
+    # below them so the returned token never skips a change the scans did not see.
+    until = full_sync_until if full_sync else versions.tasks_version
+
+    if not full_sync:
+        if change_seq < versions.tombstones_compacted_seq:
+            raise SyncTokenExpiredError()
+        if last_id is None and change_seq >= until:
+            return dict(changed=[], deleted=[], next=since, has_more=False)
+
+    tasks = await db.scalars(
+        select(Task).where(Task.owner_id==user_id, Task.change_seq <= until,
+                           _after_change(Task.change_seq, Task.id, change_seq, last_id))
+        .order_by(Task.change_seq, Task.id).limit(limit + 1))
+    changes = [(task.change_seq, task.id, task) for task in tasks]
+    if not full_sync:
+        tombstones = await db.execute(
+            select(TaskTombstone.change_seq, TaskTombstone.task_id)
+            .where(TaskTombstone.owner_id==user_id, TaskTombstone.change_seq <= until,
+                   _after_change(TaskTombstone.change_seq, TaskTombstone.task_id, change_seq, last_id))
+            .order_by(TaskTombstone.change_seq, TaskTombstone.task_id).limit(limit + 1))
+        changes.extend((row.change_seq, row.task_id, None) for row in tombstones)
+
+    changes.sort(key=lambda change: change[:2])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        next_token = encode_sync_token(changes[-1][0], changes[-1][1], full_sync_until)
+    else:
+        # Everything up to the bound has been returned. A full sync ends at the version it
+        # started from, so tasks written or deleted while it was paged arrive by delta sync.
+        next_token = encode_sync_token(until)
+
+    return dict(
+        changed=[task for _, _, task in changes if task is not None],
+        deleted=[task_id for _, task_id, task in changes if task is None],
+        next=next_token,
+        has_more=has_more,
+    )
+
+async def compact_task_tombstones(db: AsyncSession, older_than: datetime) -> int:
+    """Deletes tombstones of tasks deleted before older_than; sync tokens issued before them get 410 afterwards."""
+    expired = (TaskTombstone.owner_id==User.id, TaskTombstone.deleted_at < older_than)
+    await db.execute(
+        update(User)
+        .where(select(TaskTombstone.id).where(*expired).exists())
+        .values(tombstones_compacted_seq=select(func.max(TaskTombstone.change_seq)).where(*expired).scalar_subquery())
+        .execution_options(synchronize_session=False))
+    result = await db.execute(delete(TaskTombstone).where(TaskTombstone.deleted_at < older_than))
+    await db.commit()
+    return result.rowcount
 
-# --- User CRUD ---
 
 async def create_user(db:AsyncSession, user_data: UserCreate) -> User:
     new_user = User(username=user_data.username, email = user_data.email, hashed_password = user_data.password)
     db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
+    replica_router.mark_write(new_user.id)
     return new_user
 
 async def get_user_by_id(db: AsyncSession, user_id:int) -> User:
@@ -105,23 +611,39 @@ async def get_user_by_username(db: AsyncSession, username: str) -> User:
     return user
 
 async def update_user(db: AsyncSession, user_id: int, data: dict) -> User:
-    user = await db.scalar(select(User).where(User.id==user_id))
-
-    if not user:
-        raise UserNotFoundError()
-    
+    """Updates the user with a single UPDATE ... RETURNING statement."""
     if not data:
         raise InvalidDataError('Update data cannot be empty.')
     
-    for key, value in data.items():
-        if value:
-            setattr(user, key, value)
+    values = {key: value for key, value in data.items() if value}
+    if values:
+        query = update(User).where(User.id==user_id).values(**values).returning(User)
+    else:
+        query = select(User).where(User.id==user_id)
+
+    user = await db.scalar(query)
+    if not user:
+        raise UserNotFoundError()
 
     await db.commit()
-    await db.refresh(user)
+    user_cache.invalidate(user_id)
+    replica_router.mark_write(user_id)
     return user
 
+async def update_user_password_hash(db: AsyncSession, user_id: int, old_hash: str, new_hash: str) -> bool:
+    """Replaces the password hash unless the password was changed in the meantime."""
+    result = await db.execute(
+        update(User)
+        .where(User.id==user_id, User.hashed_password==old_hash)
+        .values(hashed_password=new_hash))
+    await db.commit()
+    user_cache.invalidate(user_id)
+    replica_router.mark_write(user_id)
+    return result.rowcount > 0
+
 async def delete_user(db: AsyncSession, user_id: int) -> bool:
     result = await db.execute(delete(User).where(User.id==user_id))
     await db.commit()
+    user_cache.invalidate(user_id)
+    replica_router.mark_write(user_id)
     return result
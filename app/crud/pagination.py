@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+
+from app.core.exceptions import InvalidDataError
+
+
+def encode_cursor(sort_by: str, sort_order: str, sort_key, last_id: int) -> str:
+    """Packs the position of the last row of a page into an opaque token."""
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    raw = json.dumps([sort_by, sort_order, sort_key, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+# JSON type of the sort key a cursor carries for each sort column; deadlines are ISO strings or null.
+SORT_KEY_TYPES = {'id': int, 'priority': int, 'title': str, 'done': bool}
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> tuple:
+    """Returns the (sort_key, id) pair stored in a cursor issued for the same sorting."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, sort_key, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        if sort_by == 'deadline' and sort_key is not None:
+            sort_key = datetime.fromisoformat(sort_key)
+    except (ValueError, TypeError):
+        raise InvalidDataError('Invalid pagination cursor.')
+
+    if (cursor_sort, cursor_order) != (sort_by, sort_order) or type(last_id) is not int:
+        raise InvalidDataError('Pagination cursor does not match the requested sorting.')
+    # The key is bound as a parameter of the sort column's type, so a mismatched value would fail in the database.
+    if sort_by != 'deadline' and type(sort_key) is not SORT_KEY_TYPES.get(sort_by):
+        raise InvalidDataError('Invalid pagination cursor.')
+    return sort_key, last_id
+
+
+def encode_sync_token(change_seq: int, last_id: int | None = None, full_sync_until: int | None = None) -> str:
+    """A delta sync position: every change up to change_seq, or up to (change_seq, last_id) mid-page.
+
+    A full sync's continuation carries the version the full sync ends at as full_sync_until.
+    """
+    raw = json.dumps(['sync', change_seq, last_id, full_sync_until], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_sync_token(token: str) -> tuple[int, int | None, int | None]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        kind, change_seq, last_id, full_sync_until = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidDataError('Invalid sync token.')
+
+    if (kind != 'sync' or not isinstance(change_seq, int)
+            or not all(isinstance(value, (int, type(None))) for value in (last_id, full_sync_until))):
+        raise InvalidDataError('Invalid sync token.')
+    return change_seq, last_id, full_sync_until
@@ -1,21 +1,82 @@
-from fastapi import Depends, FastAPI
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+import jwt
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncEngine, AsyncSession
 from typing import Annotated, AsyncGenerator
 
 from app.core import config
+from app.core.config import SettingsDataBase
 from app.database.models import Base
+from app.database.pool import InstrumentedQueuePool
+from app.database.replicas import ReplicaRouter
+from app.security.hashing import hash_pool
 from contextlib import asynccontextmanager
 
 
 #---Create engine and session---
-engine = create_async_engine(config.DATABASE_URL, echo=config.ECHO_SQL)
-async_session = async_sessionmaker(engine)
+def create_engine(url: str = config.DATABASE_URL, settings: SettingsDataBase = config.settings_db) -> AsyncEngine:
+    """The one place engines are built, so every pool follows SettingsDataBase."""
+    options = {'echo': settings.ECHO_SQL}
+    database = make_url(url).database
+
+    # In-memory SQLite lives in a single connection, which SQLAlchemy keeps in a static pool.
+    if not (url.startswith('sqlite') and database in (None, '', ':memory:')):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.POOL_SIZE,
+            max_overflow=settings.MAX_OVERFLOW,
+            pool_timeout=settings.POOL_TIMEOUT,
+            pool_pre_ping=settings.POOL_PRE_PING,
+            pool_recycle=settings.POOL_RECYCLE,
+        )
+    if url.startswith('postgresql+asyncpg'):
+        options['connect_args'] = {'prepared_statement_cache_size': settings.STATEMENT_CACHE_SIZE}
+
+    return create_async_engine(url, **options)
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Checkout latency and saturation of the engine's pool."""
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        return engine.pool.stats()
+    return {}
+
+engine = create_engine()
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+replica_router = ReplicaRouter(
+    primary=async_session,
+    replicas=[create_engine(url) for url in config.settings_db.REPLICA_URLS],
+    eject_seconds=config.settings_db.REPLICA_EJECT_SECONDS,
+    pin_seconds=config.settings_db.READ_YOUR_WRITES_SECONDS,
+)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
 
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
+
+def _request_user_id(request: Request) -> int | None:
+    """User id claimed by the bearer token. Only used to route reads, authentication verifies it."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        return int(jwt.decode(token, options={'verify_signature': False})['sub'])
+    except (jwt.PyJWTError, KeyError, ValueError):
+        return None
+
+async def get_read_session(request: Request, primary_session: SessionDep) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only queries: a replica when one is configured, else the request's primary session."""
+    session_factory = replica_router.session_factory(_request_user_id(request))
+    if session_factory is replica_router.primary:
+        yield primary_session
+        return
+    async with session_factory() as session:
+        yield session
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -23,6 +84,9 @@ async def lifespan(app: FastAPI):
         await conn.run_sync(Base.metadata.create_all)
     yield 
     await engine.dispose()
+    for replica_engine in replica_router.engines:
+        await replica_engine.dispose()
+    hash_pool.shutdown()
 
-SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
 
@@ -0,0 +1,157 @@
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestDbStats:
+    """Database usage of a single request."""
+    connections: int = 0
+    connection_hold_seconds: float = 0.0
+    statements: int = 0
+    db_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
+    statement_repeats: dict[str, int] = field(default_factory=dict)
+
+    def record_statement(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        self.statement_repeats[statement] = self.statement_repeats.get(statement, 0) + 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def most_repeated(self) -> tuple[str | None, int]:
+        if not self.statement_repeats:
+            return None, 0
+        return max(self.statement_repeats.items(), key=lambda item: item[1])
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        return [
+            (b'x-db-statements', str(self.statements).encode()),
+            (b'x-db-time-ms', f'{self.db_seconds * 1000:.3f}'.encode()),
+            (b'x-db-slowest-ms', f'{self.slowest_seconds * 1000:.3f}'.encode()),
+        ]
+
+    def log_fields(self) -> dict:
+        return {
+            'db_statements': self.statements,
+            'db_time_ms': round(self.db_seconds * 1000, 3),
+            'db_slowest_ms': round(self.slowest_seconds * 1000, 3),
+            'db_slowest_statement': self.slowest_statement,
+            'db_connection_hold_ms': round(self.connection_hold_seconds * 1000, 3),
+        }
+
+
+@dataclass
+class ConnectionHoldSummary:
+    """Connection hold time per request, aggregated over all requests of this process."""
+    requests: int = 0
+    requests_with_connection: int = 0
+    hold_seconds_total: float = 0.0
+    hold_seconds_max: float = 0.0
+
+    def record(self, stats: RequestDbStats):
+        self.requests += 1
+        if stats.connections:
+            self.requests_with_connection += 1
+            self.hold_seconds_total += stats.connection_hold_seconds
+            self.hold_seconds_max = max(self.hold_seconds_max, stats.connection_hold_seconds)
+
+    def stats(self) -> dict:
+        used = self.requests_with_connection
+        return {
+            'requests': self.requests,
+            'requests_with_connection': used,
+            'hold_avg_ms': round(self.hold_seconds_total / used * 1000, 3) if used else 0.0,
+            'hold_max_ms': round(self.hold_seconds_max * 1000, 3),
+        }
+
+
+request_db_stats: ContextVar[RequestDbStats | None] = ContextVar('request_db_stats', default=None)
+connection_hold = ConnectionHoldSummary()
+
+
+# Pool events fire for every engine, so replicas and test engines are measured too.
+# The request is remembered at checkout because checkin may run after the handler returned.
+@event.listens_for(Pool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['checked_out_at'] = time.perf_counter()
+    connection_record.info['request_stats'] = request_db_stats.get()
+
+@event.listens_for(Pool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop('checked_out_at', None)
+    stats = connection_record.info.pop('request_stats', None)
+    if checked_out_at is not None and stats is not None:
+        stats.connections += 1
+        stats.connection_hold_seconds += time.perf_counter() - checked_out_at
+
+# The start time lives on the execution context, so a statement that fails leaves nothing behind.
+# Internal cursor executions (context is None) are not timed.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._db_started_at = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, '_db_started_at', None)
+    stats = request_db_stats.get()
+    if stats is not None and started_at is not None:
+        stats.record_statement(statement, time.perf_counter() - started_at)
+
+
+def report_request(stats: RequestDbStats, method: str, path: str):
+    """Warns about requests that issue too many, repeated (N+1) or slow statements."""
+    problems = []
+    if stats.statements > settings.DB_MAX_STATEMENTS_PER_REQUEST:
+        problems.append(f'{stats.statements} statements')
+    statement, repeats = stats.most_repeated()
+    if repeats >= settings.DB_REPEATED_STATEMENT_THRESHOLD:
+        problems.append(f'statement repeated {repeats} times (possible N+1): {statement}')
+    if stats.slowest_seconds * 1000 >= settings.DB_SLOW_STATEMENT_MS:
+        problems.append(f'slow statement ({stats.slowest_seconds * 1000:.1f} ms): {stats.slowest_statement}')
+
+    if problems:
+        logger.warning('%s %s: %s', method, path, '; '.join(problems), extra=stats.log_fields())
+
+
+class DbStatsMiddleware:
+    """Collects RequestDbStats for each HTTP request (available as request.state.db_stats).
+
+    With DB_STATS_HEADERS enabled the statement count, total DB time and slowest
+    statement time so far are added to the response as X-DB-* headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        stats = RequestDbStats()
+        scope.setdefault('state', {})['db_stats'] = stats
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', []), *stats.headers()]
+            await send(message)
+
+        token = request_db_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_headers if settings.DB_STATS_HEADERS else send)
+        finally:
+            request_db_stats.reset(token)
+            connection_hold.record(stats)
+            report_request(stats, scope['method'], scope['path'])
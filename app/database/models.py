@@ -1,26 +1,22 @@
 from typing import List
 from sqlalchemy import (
+    DDL,
     Boolean,
     String,
     Integer,
     DateTime,
     ForeignKey,
+    Index,
+    event,
+    false,
     func
 )
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
-from app.core import config
 from datetime import datetime
 
 
-
-
-#---Create engine and session---
-engine = create_async_engine(config.DATABASE_URL, echo=config.ECHO_SQL)
-async_session = async_sessionmaker(engine)
-
-# ---Base---
 class Base(DeclarativeBase):
     # A common base for all models
     pass
@@ -32,6 +28,10 @@ class User(Base):
     username: Mapped[str] = mapped_column(String, unique=True)
     email: Mapped[str] = mapped_column(String, unique=True)
     hashed_password: Mapped[str] = mapped_column(String)
+    # Bumped by every write to the user's tasks; the task list ETag is built from it.
+    tasks_version: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    # Highest change_seq of the tombstones compacted away; older sync tokens get 410.
+    tombstones_compacted_seq: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
 
 # ---Model Task---
 class Task(Base):
@@ -50,8 +50,119 @@ class Task(Base):
         DateTime(timezone=True), nullable=True
     )
     owner_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
+    # Incremented by every update of the task.
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default='1')
+    updated_at: Mapped[datetime|None] = mapped_column(
+        DateTime(timezone=True), default=func.now(), nullable=True
+    )
+    # The owner's tasks_version of the last write to the task, the position of
+    # the change in GET /user/tasks/changes and part of the ETag of GET /user/tasks/{id}.
+    change_seq: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+
+    # Every list query filters by owner_id and orders by (sort column, id),
+    # so each index starts with the owner and ends with the id tiebreaker.
+    # On PostgreSQL the remaining TaskSummary and filter columns are INCLUDEd,
+    # so a list page is answered by an index-only scan without touching the heap.
+    __table_args__ = (
+        Index('ix_tasks_owner_id_id', 'owner_id', 'id',
+              postgresql_include=['title', 'deadline', 'done', 'priority']),
+        Index('ix_tasks_owner_id_priority_id', 'owner_id', 'priority', 'id',
+              postgresql_include=['title', 'deadline', 'done']),
+        Index('ix_tasks_owner_id_title_id', 'owner_id', 'title', 'id',
+              postgresql_include=['deadline', 'done', 'priority']),
+        Index('ix_tasks_owner_id_deadline_id', 'owner_id', 'deadline', 'id',
+              postgresql_include=['title', 'done', 'priority']),
+        Index('ix_tasks_owner_id_done_id', 'owner_id', 'done', 'id',
+              postgresql_include=['title', 'deadline', 'priority']),
+        Index('ix_tasks_owner_id_done_priority_id', 'owner_id', 'done', 'priority', 'id',
+              postgresql_include=['title', 'deadline']),
+        Index('ix_tasks_owner_id_created_at_id', 'owner_id', 'created_at', 'id',
+              postgresql_include=['title', 'deadline', 'done', 'priority']),
+        Index('ix_tasks_owner_id_change_seq_id', 'owner_id', 'change_seq', 'id'),
+        Index(
+            'ix_tasks_owner_id_open_deadline_id', 'owner_id', 'deadline', 'id',
+            postgresql_include=['title', 'done', 'priority'],
+            postgresql_where=done == false(),
+            sqlite_where=done == false(),
+        ),
+    )
+
+
+class TaskTombstone(Base):
+    """A deleted task, kept so delta sync can report the deletion until it is compacted."""
+    __tablename__ = 'task_tombstones'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task_id: Mapped[int] = mapped_column(Integer)
+    owner_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
+    change_seq: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (
+        Index('ix_task_tombstones_owner_id_change_seq_task_id', 'owner_id', 'change_seq', 'task_id'),
+        Index('ix_task_tombstones_deleted_at', 'deleted_at'),
+    )
+
+
+# ---Task full-text search---
+# Title and description are searched through a per-backend index that is not a mapped column.
+# PostgreSQL: a generated tsvector column and a GIN index on (owner_id, search_vector)
+# (btree_gin), so a search only reads the postings of the owner's tasks.
+# SQLite: an external-content FTS5 table kept in sync by triggers; owner_id is indexed
+# in it too, so MATCH intersects the owner with the search terms.
+TASK_SEARCH_DDL = {
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        "ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED",
+        "CREATE INDEX ix_tasks_owner_id_search_vector ON tasks USING gin (owner_id, search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+        "title, description, owner_id, content='tasks', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts(rowid, title, description, owner_id) "
+        "VALUES (new.id, new.title, new.description, new.owner_id); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description, owner_id) "
+        "VALUES ('delete', old.id, old.title, old.description, old.owner_id); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, owner_id ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description, owner_id) "
+        "VALUES ('delete', old.id, old.title, old.description, old.owner_id); "
+        "INSERT INTO tasks_fts(rowid, title, description, owner_id) "
+        "VALUES (new.id, new.title, new.description, new.owner_id); END",
+    ],
+}
+
+for dialect, statements in TASK_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Task.__table__, 'after_create', DDL(statement).execute_if(dialect=dialect))
+event.listen(Task.__table__, 'after_drop', DDL('DROP TABLE IF EXISTS tasks_fts').execute_if(dialect='sqlite'))
+
+# SQLite's lower() only folds ASCII letters, so search ranking lowercases with Python's str.lower,
+# the same folding the search terms get.
+@event.listens_for(Engine, 'connect')
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, 'create_function'):
+        dbapi_connection.create_function('unicode_lower', 1, lambda value: value if value is None else value.lower(), deterministic=True)
+
+
+# ---Task counters---
+# Per-user aggregates that the task CRUD keeps up to date when TASK_COUNTERS_ENABLED is set,
+# so /user/tasks/stats reads a few rows however many tasks the user has.
+class TaskCounter(Base):
+    __tablename__ = 'task_counters'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # Tasks without a priority are counted as priority 0.
+    priority: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    done: Mapped[int] = mapped_column(Integer, default=0)
 
+class TaskCompletionBucket(Base):
+    """Done tasks of a user by time-to-complete (completed_at - created_at), see crud.completion_bucket."""
+    __tablename__ = 'task_completion_buckets'
 
-async def async_models_main():
-    async with engine.begin() as conn:        
-        await conn.run_sync(Base.metadata.create_all)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    completed: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,42 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.checkout_wait_total += waited
+            self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def stats(self) -> dict:
+        capacity = self.size() + self._max_overflow
+        checked_out = self.checkedout()
+        return {
+            'pool_size': self.size(),
+            'max_overflow': self._max_overflow,
+            'checked_out': checked_out,
+            'overflow': max(self.overflow(), 0),
+            'saturation': round(checked_out / capacity, 3) if capacity > 0 else 0.0,
+            'checkouts': self.checkouts,
+            'checkout_timeouts': self.checkout_timeouts,
+            'checkout_wait_avg_ms': round(self.checkout_wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            'checkout_wait_max_ms': round(self.checkout_wait_max * 1000, 3),
+        }
@@ -0,0 +1,64 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.core.cache import TTLCache
+
+
+class ReplicaRouter:
+    """Chooses the session factory for read-only sessions.
+
+    Healthy replicas are used round-robin. A replica whose connections fail is ejected
+    for `eject_seconds`; with every replica ejected reads fall back to the primary.
+    A user that wrote within `pin_seconds` reads from the primary to see their own writes.
+    """
+
+    def __init__(
+            self,
+            primary: async_sessionmaker,
+            replicas: list[AsyncEngine],
+            eject_seconds: float,
+            pin_seconds: float,
+            max_pinned_users: int = 100_000
+            ):
+        self.primary = primary
+        self.engines = replicas
+        self.replicas = [async_sessionmaker(replica, expire_on_commit=False) for replica in replicas]
+        self.eject_seconds = eject_seconds
+        self.pin_seconds = pin_seconds
+        self._next = 0
+        self._ejected_until: dict[int, float] = {}
+        self._recent_writers = TTLCache(maxsize=max_pinned_users if pin_seconds > 0 else 0, ttl=pin_seconds)
+
+        for index, replica in enumerate(replicas):
+            event.listen(replica.sync_engine, 'handle_error', self._error_handler(index))
+
+    def _error_handler(self, index: int):
+        def handle_error(context):
+            # No connection means it could not even be opened; is_disconnect means it broke.
+            if context.connection is None or context.is_disconnect:
+                self.eject(index)
+        return handle_error
+
+    def eject(self, index: int):
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+
+    def healthy_replicas(self) -> list[int]:
+        now = time.monotonic()
+        return [index for index in range(len(self.replicas)) if self._ejected_until.get(index, 0) <= now]
+
+    def mark_write(self, user_id: int):
+        self._recent_writers.set(user_id, True)
+
+    def session_factory(self, user_id: int | None = None) -> async_sessionmaker:
+        """The replica to read from next, or the primary when none fits."""
+        if user_id is not None and self._recent_writers.get(user_id):
+            return self.primary
+
+        healthy = self.healthy_replicas()
+        if not healthy:
+            return self.primary
+
+        index = healthy[self._next % len(healthy)]
+        self._next += 1
+        return self.replicas[index]
@@ -1,11 +1,11 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, Request, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, status
 from fastapi.security import HTTPBearer, OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from jwt import InvalidTokenError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.security.limiter import limiter
-from app.security.security import create_access_token, create_refresh_token, decode_jwt_token, get_password_hash, verify_password
+from app.security.security import create_access_token, create_refresh_token, decode_jwt_token, get_password_hash_async, verify_password_async, password_needs_rehash, rehash_password
 from app.core.exceptions import InvalidCredentialsError, UserAlreadyExistsError
 from app.database.database import SessionDep
 from app.crud.crud import get_user_by_id, get_user_by_username, create_user
@@ -15,11 +15,20 @@ from app.database.models import User
 router = APIRouter(prefix='/auth', tags=['Auth'])
 http_bearer = HTTPBearer()
 
-async def autenticate_user(db: AsyncSession, username: str, plain_password: str) -> User | None :
+async def autenticate_user(
+        db: AsyncSession, 
+        username: str, 
+        plain_password: str, 
+        background_tasks: BackgroundTasks | None = None
+        ) -> User | None :
     
     user = await get_user_by_username(db, username)
-    if not user or not verify_password(plain_password, user.hashed_password):
+    if not user or not await verify_password_async(plain_password, user.hashed_password):
         return None
+    
+    # The plain password is only available here, so outdated hashes are upgraded after the response.
+    if background_tasks is not None and password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(rehash_password, user.id, user.hashed_password, plain_password)
     return user
 
 @router.post('/login')
@@ -27,10 +36,11 @@ async def autenticate_user(db: AsyncSession, username: str, plain_password: str)
 async def login(
     request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session: SessionDep
+    session: SessionDep,
+    background_tasks: BackgroundTasks
     ) -> Token:
 
-    user = await autenticate_user(session, form_data.username, form_data.password)
+    user = await autenticate_user(session, form_data.username, form_data.password, background_tasks)
     if not user: 
         raise InvalidCredentialsError()
     access_token = create_access_token(user=user)
@@ -74,7 +84,7 @@ async def register_user(
     if exciting_user: 
         raise UserAlreadyExistsError()
     
-    user_reg.password = get_password_hash(user_reg.password)
+    user_reg.password = await get_password_hash_async(user_reg.password)
     new_user = await create_user(session, user_reg)
     
     access_token = create_access_token(user=new_user)
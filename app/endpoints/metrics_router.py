@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import token_cache, user_cache
+from app.core.metrics import Gauge, registry
+from app.database.database import engine, pool_stats, replica_router
+from app.database.instrumentation import connection_hold
+from app.security.hashing import hash_pool
+
+
+router = APIRouter(tags=['Metrics'])
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _stats_gauges(prefix: str, help: str, rows: list[tuple[tuple, dict]], labelnames: tuple[str, ...] = ()) -> list[Gauge]:
+    """One gauge per numeric stats() key, with a series per labelled stats dict."""
+    gauges: dict[str, Gauge] = {}
+    for labels, stats in rows:
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key not in gauges:
+                gauges[key] = Gauge(f'{prefix}_{key}', f'{help}: {key}.', labelnames)
+            gauges[key].set(*labels, value=value)
+    return list(gauges.values())
+
+def collect_stats():
+    engines = [('primary', engine), *((f'replica_{i}', replica) for i, replica in enumerate(replica_router.engines))]
+    yield from _stats_gauges('db_pool', 'Connection pool', [((name, ), pool_stats(pool_engine)) for name, pool_engine in engines], ('engine',))
+    yield from _stats_gauges('db_connection_hold', 'Connection hold per request', [((), connection_hold.stats())])
+    yield from _stats_gauges('password_hash_pool', 'Password hash pool', [((), hash_pool.stats())])
+    yield from _stats_gauges('cache', 'In-process cache', [(('user', ), user_cache.stats()), (('token', ), token_cache.stats())], ('cache',))
+
+    healthy = Gauge('db_replicas_healthy', 'Read replicas currently receiving queries.')
+    healthy.set(value=len(replica_router.healthy_replicas()))
+    yield healthy
+
+registry.add_collector(collect_stats)
+
+
+@router.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
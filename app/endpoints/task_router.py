@@ -1,15 +1,32 @@
-from fastapi import APIRouter, HTTPException, Query, status
-from typing import List, Literal
+import csv
+import hashlib
+import io
+import orjson
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated, AsyncIterator, List, Literal
 
 from app.crud import crud
-from app.schemas.schemas import TaskSummary, TaskCreate, TaskRead, TaskUpdate
-from app.database.database import SessionDep
+from app.schemas.schemas import TaskSummary, TaskCreate, TaskChanges, TaskFilter, TaskRead, TaskStats, TaskUpdate, TaskBatchRequest, TaskBatchResponse
+from app.database.database import ReadSessionDep, SessionDep
+from app.core.config import settings
 from app.core.exceptions import TaskNotFoundError, TaskAccessDeniedError
+from app.core.responses import ORJSONResponse, etag_matches, not_modified
 from app.security.security import UserDep
 from app.security.access import verify_task_access
 
 router = APIRouter(prefix='/user/tasks', tags=['Tasks'])
 
+def _task_etag(task) -> str:
+    # change_seq only grows for an owner, so a task that reuses a deleted task's id never repeats its tag.
+    return f'"{task.owner_id}.{task.id}.{task.change_seq}"'
+
+def _list_etag(user_id: int, tasks_version: int, query: str) -> str:
+    # The user is part of the tag, so clients that share a cache across accounts never get another user's 304.
+    digest = hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+    return f'"{user_id}.{tasks_version}.{digest}"'
+
 @router.post('/', response_model=TaskRead, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task_data: TaskCreate, 
@@ -19,20 +36,55 @@ async def create_task(
     
     return await crud.create_task(session, task_data, current_user.id)
 
+@router.post('/batch', response_model=TaskBatchResponse)
+async def apply_tasks_batch(
+    batch: TaskBatchRequest,
+    current_user: UserDep,
+    session: SessionDep,
+    response: Response
+    ):
+    
+    results, committed = await crud.apply_task_batch(
+        session, 
+        batch.operations, 
+        current_user.id, 
+        atomic=batch.mode == 'atomic')
+    
+    if not committed:
+        # An atomic batch answers with the status of the operation that failed it.
+        response.status_code = next(result['status_code'] for result in results 
+                                    if result['status_code'] != status.HTTP_424_FAILED_DEPENDENCY)
+    return TaskBatchResponse(mode=batch.mode, committed=committed, results=results)
+
 @router.get('/', response_model=List[TaskSummary])
 async def get_tasks_list(
+    request: Request,
     current_user: UserDep, 
-    session: SessionDep,
+    session: ReadSessionDep,
+    filters: Annotated[TaskFilter, Depends()],
     page:int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     status: bool | None = None,
     priority: int | None = None,
     sort: Literal['id', 'priority', 'title', 'deadline', 'done'] = 'id',
-    sort_order: str = 'asc'):
+    sort_order: str = 'asc',
+    cursor: str | None = Query(None, description='Opaque X-Next-Cursor value of the previous page; replaces page.'),
+    q: str | None = Query(None, max_length=200, description='Full-text search in title and description; results are ranked by relevance and paged by page only.')):
    
+   # The list only changes when tasks_version does, so a matching If-None-Match is answered
+   # from the users row alone. It is read before the tasks: a write in between gives an older
+   # tag, never a tag of data the client has not seen. overdue depends on the clock, so no tag.
+   etag = None
+   if filters.overdue is None:
+       tasks_version = await crud.get_tasks_version(session, current_user.id)
+       if tasks_version is not None:
+           etag = _list_etag(current_user.id, tasks_version, request.url.query)
+           if etag_matches(request, etag):
+               return not_modified(etag)
+
    offset = (page-1) * limit
 
-   tasks_list = await crud.get_list_tasks_titles(
+   tasks_list, next_cursor = await crud.get_list_tasks_titles(
        session, 
        current_user.id, 
        offset, 
@@ -40,19 +92,97 @@ async def get_tasks_list(
        status_filter=status,
        priority_filter=priority,
        sort_by=sort,
-       sort_order=sort_order)
+       sort_order=sort_order,
+       cursor=cursor,
+       search=q,
+       filters=filters)
    
-   return tasks_list
+   # The rows already have the TaskSummary fields, so they are rendered as they are
+   # instead of being validated into models and encoded again.
+   headers = {}
+   if next_cursor:
+       headers['X-Next-Cursor'] = next_cursor
+   if etag:
+       headers['ETag'] = etag
+   return ORJSONResponse(tasks_list, headers=headers)
+
+@router.get('/export', response_class=StreamingResponse)
+async def export_tasks(
+    current_user: UserDep,
+    session: ReadSessionDep,
+    filters: Annotated[TaskFilter, Depends()],
+    format: Literal['ndjson', 'csv'] = 'ndjson',
+    status: bool | None = None,
+    priority: int | None = None,
+    sort: Literal['id', 'priority', 'title', 'deadline', 'done'] = 'id',
+    sort_order: str = 'asc'):
+    """Streams every task of the user that matches the list filters, one row per line."""
+
+    batches = crud.stream_task_batches(
+        session,
+        current_user.id,
+        status_filter=status,
+        priority_filter=priority,
+        sort_by=sort,
+        sort_order=sort_order,
+        batch_size=settings.TASK_EXPORT_BATCH_SIZE,
+        filters=filters)
+
+    chunks, media_type = (_ndjson_chunks(batches), 'application/x-ndjson') if format == 'ndjson' else (_csv_chunks(batches), 'text/csv')
+    headers = {'Content-Disposition': f'attachment; filename="tasks.{format}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+async def _ndjson_chunks(batches) -> AsyncIterator[bytes]:
+    options = orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE
+    async for rows in batches:
+        yield b''.join(orjson.dumps(row._asdict(), option=options) for row in rows)
+
+async def _csv_chunks(batches) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(column.key for column in crud.TASK_EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows([value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get('/stats', response_model=TaskStats)
+async def get_task_stats(
+    current_user: UserDep,
+    session: ReadSessionDep
+    ):
+    """Counts of open, done and overdue tasks and per priority, completion rate and median time-to-complete."""
+
+    return await crud.get_task_stats(session, current_user.id)
+
+@router.get('/changes', response_model=TaskChanges)
+async def get_task_changes(
+    current_user: UserDep,
+    session: ReadSessionDep,
+    since: str | None = Query(None, description='next of the previous call; without it every task is returned.'),
+    limit: int = Query(100, ge=1, le=1000)):
+    """Tasks created, updated or deleted since the token. 410 means the token is too old: sync again without one."""
+
+    return await crud.get_task_changes(session, current_user.id, since, limit)
 
 @router.get('/{task_id}', response_model=TaskRead)
 async def get_one_task(
     task_id: int, 
+    request: Request,
+    response: Response,
     current_user: UserDep, 
-    session: SessionDep
+    session: ReadSessionDep
     ):
     
     task = await crud.get_one_task(session, task_id)
     await verify_task_access(task, current_user.id)
+    etag = _task_etag(task)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
     return task
 
 @router.put('/{task_id}', response_model=TaskRead)
@@ -60,12 +190,12 @@ async def update_task(
     task_id: int, 
     update_data: TaskUpdate, 
     current_user: UserDep,  
-    session: SessionDep
+    session: SessionDep,
+    response: Response
     ):
     
-    task = await crud.get_one_task(session, task_id)
-    await verify_task_access(task, current_user.id)
-    updated_task = await crud.update_task(session, task_id, update_data.model_dump()) 
+    updated_task = await crud.update_task(session, task_id, update_data.model_dump(), current_user.id) 
+    response.headers['ETag'] = _task_etag(updated_task)
     return updated_task
     
 @router.delete('/{task_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -75,8 +205,6 @@ async def delete_task(
     session: SessionDep
     ):
     
-    task = await crud.get_one_task(session, task_id)
-    await verify_task_access(task, current_user.id)
-    await crud.delete_task(session, task_id)
+    await crud.delete_task(session, task_id, current_user.id)
     
     
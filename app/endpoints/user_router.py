@@ -4,7 +4,7 @@ from fastapi import APIRouter,status
 from app.crud import crud
 from app.schemas.schemas import  UserRead, UserUpdate
 from app.database.database import SessionDep
-from app.security.security import UserDep, get_password_hash
+from app.security.security import UserDep, get_password_hash_async, revoke_user_tokens
 
 
 router = APIRouter(prefix='/users', tags=['Users'])
@@ -24,14 +24,17 @@ async def update_user(
     user_data = {
         'username': user_data.username,
         'email': user_data.email,
-        'hashed_password': get_password_hash(user_data.password)
+        'hashed_password': await get_password_hash_async(user_data.password)
     }
     updated_user = await crud.update_user(
         session, 
         current_user.id, 
         user_data)
+    # Stateless access tokens carry the old username and email.
+    revoke_user_tokens(current_user.id)
     return updated_user
 
 @router.delete('/me', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(current_user: UserDep, session: SessionDep):
-    await crud.delete_user(session, current_user.id)
\ No newline at end of file
+    await crud.delete_user(session, current_user.id)
+    revoke_user_tokens(current_user.id)
\ No newline at end of file
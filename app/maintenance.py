@@ -0,0 +1,52 @@
+"""Maintenance commands, run against the configured database.
+
+Usage:
+    python -m app.maintenance rebuild-task-counters [--user-id ID]
+    python -m app.maintenance compact-task-tombstones [--days DAYS]
+
+rebuild-task-counters recomputes task_counters and task_completion_buckets from the tasks.
+Writes made while TASK_COUNTERS_ENABLED is off are not counted, so run it before turning
+the setting on (and after any bulk load that bypasses the API, such as benchmarks.seed).
+
+compact-task-tombstones deletes the tombstones of tasks deleted more than --days
+(default TASK_TOMBSTONE_RETENTION_DAYS) ago. Clients whose sync token predates them
+get 410 from /user/tasks/changes and sync again from scratch. Run it daily, e.g. from cron.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.crud import crud
+from app.database.database import async_session, engine
+
+
+async def rebuild_task_counters(args):
+    async with async_session() as session:
+        await crud.rebuild_task_counters(session, args.user_id)
+
+
+async def compact_task_tombstones(args):
+    older_than = datetime.now(timezone.utc) - timedelta(days=args.days)
+    async with async_session() as session:
+        deleted = await crud.compact_task_tombstones(session, older_than)
+    print(f'Deleted {deleted} tombstones older than {older_than.isoformat()}.')
+
+
+async def main(args):
+    try:
+        await args.command(args)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(required=True)
+    rebuild = commands.add_parser('rebuild-task-counters', help='recompute the task counters from the tasks')
+    rebuild.add_argument('--user-id', type=int, help='only this user (default: everyone)')
+    rebuild.set_defaults(command=rebuild_task_counters)
+    compact = commands.add_parser('compact-task-tombstones', help='delete old tombstones of deleted tasks')
+    compact.add_argument('--days', type=float, default=settings.TASK_TOMBSTONE_RETENTION_DAYS)
+    compact.set_defaults(command=compact_task_tombstones)
+    asyncio.run(main(parser.parse_args()))
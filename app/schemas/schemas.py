@@ -1,6 +1,8 @@
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
+
+from app.core.config import settings
 
 
 # --- Users schemas ---
@@ -60,6 +62,76 @@ class TaskUpdate(TaskBase):
     deadline: datetime | None = None
     done: bool | None = None
 
+class TaskFilter(BaseModel):
+    """Range filters of the task list and export. *_after bounds are inclusive, *_before bounds exclusive."""
+    deadline_after: datetime | None = None
+    deadline_before: datetime | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    priority_min: int | None = Field(default=None, ge=0, le=5)
+    priority_max: int | None = Field(default=None, ge=0, le=5)
+    overdue: bool | None = Field(default=None, description='true: past the deadline and not done; false: everything else.')
+
+class TaskStats(BaseModel):
+    total: int
+    open: int
+    done: int
+    overdue: int
+    by_priority: dict[int, int] = Field(description='Tasks per priority; tasks without one count as priority 0.')
+    completion_rate: float | None = Field(description='done / total, null without tasks.')
+    median_completion_seconds: float | None = Field(
+        description='Median of completed_at - created_at over done tasks; estimated when read from the task counters.')
+
+
+class TaskChanges(BaseModel):
+    changed: list[TaskRead] = Field(description='Tasks created or updated after the token, oldest change first.')
+    deleted: list[int] = Field(description='Ids of tasks deleted after the token; apply them before changed, as an id can be reused.')
+    next: str = Field(description='Token to pass as since on the next call.')
+    has_more: bool = Field(description='More changes are waiting; call again right away with next.')
+
+
+# --- Task batch schemas ---
+class TaskBatchCreate(BaseModel):
+    op: Literal['create']
+    data: TaskCreate
+
+
+class TaskBatchUpdate(BaseModel):
+    op: Literal['update']
+    id: int
+    data: TaskUpdate
+
+
+class TaskBatchDelete(BaseModel):
+    op: Literal['delete']
+    id: int
+
+
+TaskBatchOperation = Annotated[
+    Union[TaskBatchCreate, TaskBatchUpdate, TaskBatchDelete],
+    Field(discriminator='op')
+]
+
+
+class TaskBatchRequest(BaseModel):
+    mode: Literal['atomic', 'best_effort'] = 'atomic'
+    operations: list[TaskBatchOperation] = Field(min_length=1, max_length=settings.TASK_BATCH_MAX_OPERATIONS)
+
+
+class TaskBatchItemResult(BaseModel):
+    index: int
+    op: str
+    status_code: int
+    id: int | None = None
+    task: TaskRead | None = None
+    detail: str | None = None
+
+
+class TaskBatchResponse(BaseModel):
+    mode: str
+    committed: bool
+    results: list[TaskBatchItemResult]
+
 TaskRead.model_rebuild()
 UserRead.model_rebuild()
 
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.core.metrics import password_hash_duration
+
+T = TypeVar('T')
+
+
+class PasswordHashPool:
+    """Runs CPU-heavy password hashing outside the event loop.
+
+    At most `workers` jobs run at once and at most `queue_size` more may wait for a worker;
+    anything beyond that is rejected with a 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: int, queue_size: int, kind: str = 'thread'):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.kind = kind
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        started_at = time.perf_counter()
+        if not self.workers:
+            try:
+                return func(*args)
+            finally:
+                password_hash_duration.observe(value=time.perf_counter() - started_at)
+
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise ServiceUnavailableError()
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            # Includes the wait for a free worker, which is what requests feel.
+            password_hash_duration.observe(value=time.perf_counter() - started_at)
+
+    def stats(self) -> dict:
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': self.in_flight,
+            'queued': max(self.in_flight - self.workers, 0),
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hash_pool = PasswordHashPool(
+    workers=settings.HASH_POOL_WORKERS,
+    queue_size=settings.HASH_POOL_QUEUE_SIZE,
+    kind=settings.HASH_POOL_KIND,
+)
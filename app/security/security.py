@@ -1,15 +1,23 @@
 import jwt
+import hashlib
+import logging
+import time
 from fastapi import Depends
 from fastapi.security import HTTPBearer, OAuth2PasswordBearer
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
+from app.core.cache import token_cache, user_cache
 from app.core.config import settings
 from app.core.exceptions import ExpiredTokenError, InvalidTokenError, InvalidTokenTypeError, InvalidCredentialsError
-from app.database.database import SessionDep
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import ReadSessionDep, async_session
 from app.database.models import User
-from app.crud.crud import get_user_by_id
+from app.crud.crud import get_user_by_id, update_user_password_hash
+from app.security.hashing import hash_pool
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
@@ -17,7 +25,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
 
-password_hash = PasswordHash.recommended()
+logger = logging.getLogger(__name__)
+
+password_hash = PasswordHash((Argon2Hasher(**settings.argon2_params()),))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/login')
 http_bearer = HTTPBearer(auto_error=False)
 
@@ -27,10 +37,31 @@ def get_password_hash(password:str) -> str:
 def verify_password(plain_password:str, hashed_password:str) -> bool:
     return password_hash.verify(plain_password, hashed_password)
 
+async def get_password_hash_async(password: str) -> str:
+    """Hashes in the password hash pool so argon2 does not block the event loop."""
+    return await hash_pool.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verifies in the password hash pool so argon2 does not block the event loop."""
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when the hash was made with other argon2 parameters than the current profile."""
+    return password_hash.current_hasher.check_needs_rehash(hashed_password)
+
+async def rehash_password(user_id: int, old_hash: str, plain_password: str):
+    """Background job: stores a hash of the password made with the current argon2 profile."""
+    try:
+        new_hash = await get_password_hash_async(plain_password)
+        async with async_session() as session:
+            await update_user_password_hash(session, user_id, old_hash, new_hash)
+    except Exception:
+        logger.exception('Password rehash failed for user %s', user_id)
+
 def create_jwt(payload: dict, expires_delta: timedelta):
     to_encode = payload.copy()
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode.update({'exp':expire})
+    to_encode.update({'exp':expire, 'iat': time.time()})
     encode_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
     return encode_jwt
@@ -42,6 +73,7 @@ def create_access_token(
     
     payload = {
         'sub': str(user.id),
+        'username': user.username,
         'email': user.email,
         'type': 'access'
         }
@@ -63,20 +95,82 @@ def create_refresh_token(
     return create_jwt(payload=payload, expires_delta=expires_delta)
 
 def decode_jwt_token(token:str, expected_type: str) -> dict:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload['type'] != expected_type:
-            raise InvalidTokenTypeError(token_type=payload['type'], 
-                                        expected_type=expected_type)
-        return payload
-    except jwt.ExpiredSignatureError: 
+    # Verified payloads are cached until the token's own expiry, so a token
+    # presented again skips the signature check and JSON parsing.
+    cache_key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(cache_key)
+
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.ExpiredSignatureError: 
+            raise ExpiredTokenError()
+        except jwt.InvalidTokenError:
+            raise InvalidTokenError()
+        if 'exp' in payload:
+            token_cache.set(cache_key, payload, ttl=payload['exp'] - time.time())
+    elif payload['exp'] <= time.time():
+        token_cache.invalidate(cache_key)
         raise ExpiredTokenError()
-    except jwt.InvalidTokenError:
-        raise InvalidTokenError()
+
+    if payload['type'] != expected_type:
+        raise InvalidTokenTypeError(token_type=payload['type'], 
+                                    expected_type=expected_type)
+    return dict(payload)
     
+class TokenUser:
+    """The current user as described by the access token claims.
+
+    Carries what the routers read (id, username, email); the users row
+    is only queried when `load()` is awaited.
+    """
+
+    def __init__(self, id: int, username: str, email: str, session: AsyncSession):
+        self.id = id
+        self.username = username
+        self.email = email
+        self._session = session
+        self._user: User | None = None
+
+    async def load(self) -> User:
+        if self._user is None:
+            self._user = await get_user_by_id(self._session, self.id)
+        return self._user
+
+
+class TokenRevocations:
+    """In-process denylist: access tokens of a user issued before the revocation time are rejected.
+
+    An entry only has to outlive the access tokens it blocks, so it is dropped after
+    ACCESS_TOKEN_EXPIRE_MINUTES. Each worker process keeps its own list.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._revoked_at: dict[int, float] = {}
+
+    def revoke(self, user_id: int):
+        now = time.time()
+        self._revoked_at = {
+            revoked_user: revoked_at for revoked_user, revoked_at in self._revoked_at.items()
+            if now - revoked_at < self.ttl_seconds
+        }
+        self._revoked_at[user_id] = now
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        revoked_at = self._revoked_at.get(user_id)
+        return revoked_at is not None and issued_at < revoked_at
+
+
+token_revocations = TokenRevocations(ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def revoke_user_tokens(user_id: int):
+    """Invalidates the stateless access tokens issued to the user so far."""
+    token_revocations.revoke(user_id)
+
 async def get_current_user(
         token: Annotated[str, Depends(oauth2_scheme)],
-        session: SessionDep
+        session: ReadSessionDep
         ):
     
     try:
@@ -87,9 +181,22 @@ async def get_current_user(
     except jwt.PyJWTError:
         raise InvalidCredentialsError
     
-    user = await get_user_by_id(session, int(user_id))
+    # Tokens issued before the username claim was added still go through the database.
+    if settings.STATELESS_AUTH and 'username' in payload:
+        if token_revocations.is_revoked(int(user_id), payload.get('iat', 0)):
+            raise InvalidCredentialsError
+        return TokenUser(int(user_id), payload['username'], payload['email'], session)
+
+    user = user_cache.get(int(user_id))
     if user is None:
-        raise InvalidCredentialsError
+        user = await get_user_by_id(session, int(user_id))
+        if user is None:
+            raise InvalidCredentialsError
+        user_cache.set(user.id, _detached_user(user))
     return user
 
-UserDep = Annotated[User, Depends(get_current_user)]
\ No newline at end of file
+def _detached_user(user: User) -> User:
+    """A session-less copy of the user that is safe to share between requests."""
+    return User(id=user.id, username=user.username, email=user.email, hashed_password=user.hashed_password)
+
+UserDep = Annotated[User, Depends(get_current_user)]
@@ -0,0 +1,58 @@
+"""Hash latency and throughput of every argon2 profile on this machine.
+
+Usage:
+    python -m benchmarks.argon2_profiles --rounds 20 --threads 4
+
+For each profile in Settings.ARGON2_PROFILES it reports the single-hash latency
+(p50/max) and the hashes per second reachable with `--threads` parallel workers,
+which is the login QPS budget one API process can sustain with that profile.
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from app.core.config import settings
+
+
+def measure(params: dict, rounds: int, threads: int) -> dict:
+    hasher = Argon2Hasher(**params)
+
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.hash('benchmark-password')
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda _: hasher.hash('benchmark-password'), range(rounds * threads)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        **params,
+        'latency_p50_ms': round(statistics.median(latencies), 2),
+        'latency_max_ms': round(max(latencies), 2),
+        'hashes_per_second': round(rounds * threads / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=settings.HASH_POOL_WORKERS or 1)
+    parser.add_argument('--profiles', nargs='*', default=list(settings.ARGON2_PROFILES))
+    args = parser.parse_args()
+
+    results = {
+        profile: measure(settings.argon2_params(profile), args.rounds, args.threads)
+        for profile in args.profiles
+    }
+    print(json.dumps({'threads': args.threads, 'profiles': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Throughput of decode_jwt_token with and without the verified-token cache.
+
+Usage:
+    python -m benchmarks.jwt_decode --tokens 100 --rounds 200
+"""
+import argparse
+import json
+import time
+
+from app.core.cache import token_cache
+from app.database.models import User
+from app.security.security import create_access_token, decode_jwt_token
+
+
+def decodes_per_second(tokens: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            decode_jwt_token(token, expected_type='access')
+    return len(tokens) * rounds / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=100, help='distinct tokens presented in turn')
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    tokens = [
+        create_access_token(User(id=i, username=f'user_{i}', email=f'user_{i}@example.com'))
+        for i in range(args.tokens)
+    ]
+
+    maxsize = token_cache.maxsize
+    token_cache.maxsize = 0
+    uncached = decodes_per_second(tokens, args.rounds)
+
+    token_cache.maxsize = max(maxsize, args.tokens)
+    token_cache.clear()
+    cached = decodes_per_second(tokens, args.rounds)
+
+    print(json.dumps({
+        'uncached_per_second': round(uncached),
+        'cached_per_second': round(cached),
+        'speedup': round(cached / uncached, 2),
+        'cache': token_cache.stats(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Latency of an unrelated endpoint while the API is flooded with logins.
+
+Usage:
+    python -m benchmarks.login_storm --logins 200 --concurrency 50 --workers 0 4
+
+Each `--workers` value is run separately (0 hashes inline on the event loop).
+The result is printed as JSON: p50/p99 of GET / during the storm per pool size.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from main import app
+from app.database.database import get_session
+from app.database.models import Base, User
+from app.security.hashing import hash_pool
+from app.security.limiter import limiter
+from app.security.security import get_password_hash
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else values[0]
+
+
+async def run_storm(client: AsyncClient, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    storm_running = True
+    statuses: dict[int, int] = {}
+    latencies = []
+
+    async def login():
+        async with semaphore:
+            responce = await client.post('/auth/login', data={'username': 'storm_user', 'password': 'password'})
+            statuses[responce.status_code] = statuses.get(responce.status_code, 0) + 1
+
+    async def probe():
+        while storm_running:
+            start = time.perf_counter()
+            await client.get('/')
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.005)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    storm_running = False
+    await probe_task
+
+    return {
+        'logins_per_second': round(logins / elapsed, 1),
+        'login_statuses': statuses,
+        'probe_requests': len(latencies),
+        'probe_p50_ms': round(percentile(latencies, 50), 2),
+        'probe_p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+async def main(args):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:?cache=shared')
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as session:
+        session.add(User(username='storm_user', email='storm@example.com', hashed_password=get_password_hash('password')))
+        await session.commit()
+
+    async def override_get_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    limiter.enabled = False
+
+    results = {}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://bench') as client:
+        for workers in args.workers:
+            hash_pool.shutdown()
+            hash_pool.workers = workers
+            hash_pool.queue_size = args.queue_size
+            results[f'workers={workers}'] = await run_storm(client, args.logins, args.concurrency)
+
+    hash_pool.shutdown()
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 4])
+    asyncio.run(main(parser.parse_args()))
@@ -1,28 +1,46 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 
 from app.security.limiter import limiter
-from app.endpoints import auth_router, user_router, task_router
+from app.endpoints import auth_router, user_router, task_router, metrics_router
 from app.database.database import lifespan
+from app.database.instrumentation import DbStatsMiddleware
+from app.core.config import settings
 from app.core.exceptions import *
+from app.core.responses import ORJSONResponse
+from app.core.metrics import MetricsMiddleware, rate_limit_rejections, route_label
+
+
+if settings.SENTRY_DSN:
+    import sentry_sdk
+    sentry_sdk.init(dsn=settings.SENTRY_DSN, traces_sample_rate=settings.SENTRY_TRACES_SAMPLE_RATE)
 
 
 app = FastAPI(
     title="ToDo List API",
     description="Asynchronous API for managing users and tasks",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    rate_limit_rejections.inc(route_label(request.scope))
+    return _rate_limit_exceeded_handler(request, exc)
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
+app.add_middleware(DbStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router.router)
 app.include_router(user_router.router)
 app.include_router(task_router.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router.router)
 
 
 @app.get('/')
@@ -31,7 +49,8 @@ async def root():
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code= exc.status_code,
-        content={'detail': exc.detail}
+        content={'detail': exc.detail},
+        headers=exc.headers
     )
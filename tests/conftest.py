@@ -1,6 +1,7 @@
 import pytest_asyncio, pytest
 from datetime import datetime, timedelta
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from main import app
@@ -8,6 +9,8 @@ from app.database.models import Base, User, Task
 from app.database.database import get_session
 from app.security.security import get_password_hash
 from app.security.limiter import limiter as app_limiter
+from app.core.cache import token_cache, user_cache
+from app.core.config import settings
 
 SQLALCHEMY_DATABASE_URL = 'sqlite+aiosqlite:///:memory:?cache=shared'
 
@@ -44,6 +47,32 @@ def disable_rate_limiter():
     """Disables the limiter for all tests."""
     app_limiter.enabled = False
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Fixtures delete users behind crud's back, so cached users must not leak between tests."""
+    user_cache.clear()
+    token_cache.clear()
+    yield
+    user_cache.clear()
+    token_cache.clear()
+
+@pytest.fixture
+def sql_statements():
+    """Collects the SQL statements sent to the test database while the test runs."""
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine_test.sync_engine, 'before_cursor_execute', collect)
+    yield statements
+    event.remove(engine_test.sync_engine, 'before_cursor_execute', collect)
+
+@pytest.fixture
+def db_stats_headers(monkeypatch):
+    """Adds the X-DB-* statement count and timing headers to responses."""
+    monkeypatch.setattr(settings, 'DB_STATS_HEADERS', True)
+
 @pytest_asyncio.fixture(scope='function')
 async def test_user(session):
     """Create one test user for all tests"""
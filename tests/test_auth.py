@@ -1,9 +1,14 @@
 import pytest
+from pydantic import ValidationError
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
 from sqlalchemy import select
 
 from app.database.models import User
+from app.security import security
 from app.security.security import get_password_hash, decode_jwt_token
-from app.core.config import settings
+from app.core.config import DEFAULT_ARGON2_PROFILES, Settings, settings
+from tests.conftest import TestingSessionLocal
 
 
 @pytest.mark.asyncio
@@ -83,4 +88,36 @@ async def test_refresh_token(client, test_user):
     refresh_payload = decode_jwt_token(new_refresh, expected_type='refresh')
     assert str(access_payload.get('sub')) == str(test_user.id) and str(access_payload.get('sub')) == str(test_user.id)
 
-    
\ No newline at end of file
+    
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client, session, monkeypatch):
+    low_cost_hash = PasswordHash((Argon2Hasher(**settings.argon2_params('low')),)).hash('password')
+    user = User(username='legacy_user', email='legacy_user@example.com', hashed_password=low_cost_hash)
+    session.add(user)
+    await session.commit()
+    assert security.password_needs_rehash(low_cost_hash)
+
+    monkeypatch.setattr(security, 'async_session', TestingSessionLocal)
+    responce = await client.post('/auth/login', data={'username': 'legacy_user', 'password': 'password'})
+    assert responce.status_code == 200
+
+    stored_hash = await session.scalar(
+        select(User.hashed_password).where(User.id == user.id).execution_options(populate_existing=True))
+    assert stored_hash != low_cost_hash
+    assert not security.password_needs_rehash(stored_hash)
+    assert security.verify_password('password', stored_hash)
+
+    await session.delete(user)
+    await session.commit()
+
+
+def test_argon2_profiles_from_env_extend_the_defaults(monkeypatch):
+    monkeypatch.setenv('ARGON2_PROFILES', '{"fast": {"time_cost": 1, "memory_cost": 8192, "parallelism": 1}, "high": {"time_cost": 6}}')
+    env_settings = Settings()
+    assert env_settings.argon2_params() == DEFAULT_ARGON2_PROFILES['default']
+    assert env_settings.argon2_params('fast')['memory_cost'] == 8192
+    assert env_settings.argon2_params('high') == {**DEFAULT_ARGON2_PROFILES['high'], 'time_cost': 6}
+
+    monkeypatch.setenv('ARGON2_PROFILE', 'missing')
+    with pytest.raises(ValidationError, match="ARGON2_PROFILE 'missing' is not one of"):
+        Settings()
@@ -0,0 +1,43 @@
+import pytest
+
+from app.core.cache import TTLCache
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 3, 'misses': 1, 'evictions': 1, 'expirations': 0}
+
+
+def test_ttl_cache_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.core.cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=5)
+
+    now[0] += 10
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+    now[0] += 30
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 2
+
+
+def test_ttl_cache_disabled_and_invalidate():
+    disabled = TTLCache(maxsize=0, ttl=60)
+    disabled.set('a', 1)
+    assert disabled.get('a') is None
+
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('a', 1)
+    cache.invalidate('a')
+    cache.invalidate('missing')
+    assert cache.get('a') is None
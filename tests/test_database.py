@@ -0,0 +1,176 @@
+import pytest
+from sqlalchemy import delete, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.core.config import SettingsDataBase
+from app.crud import crud
+from app.database import database
+from app.database.database import create_engine, pool_stats
+from app.database.models import Base, Task, User
+from app.database.instrumentation import RequestDbStats, connection_hold, request_db_stats
+from app.database.pool import InstrumentedQueuePool
+from app.database.replicas import ReplicaRouter
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_create_engine_pool_settings(tmp_path):
+    settings = SettingsDataBase(POOL_SIZE=1, MAX_OVERFLOW=0, POOL_TIMEOUT=0.1, ECHO_SQL=False)
+    engine = create_engine(f'sqlite+aiosqlite:///{tmp_path / "pool.db"}', settings)
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    assert engine.pool.size() == 1 and engine.echo is False
+
+    async with engine.connect() as conn:
+        await conn.execute(text('SELECT 1'))
+        stats = pool_stats(engine)
+        assert stats['checked_out'] == 1 and stats['saturation'] == 1.0
+
+        with pytest.raises(exc.TimeoutError):
+            async with engine.connect():
+                pass
+
+    stats = pool_stats(engine)
+    assert stats['checked_out'] == 0
+    assert stats['checkouts'] == 2 and stats['checkout_timeouts'] == 1
+    assert stats['checkout_wait_max_ms'] >= 100
+    await engine.dispose()
+
+
+def test_create_engine_memory_sqlite():
+    engine = create_engine('sqlite+aiosqlite:///:memory:', SettingsDataBase())
+    assert not isinstance(engine.pool, InstrumentedQueuePool)
+    assert pool_stats(engine) == {}
+
+
+async def make_replica(path, rows: list) -> AsyncEngine:
+    engine = create_engine(f'sqlite+aiosqlite:///{path}', SettingsDataBase())
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine)() as session:
+        session.add_all(rows)
+        await session.commit()
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_replica_router_round_robin_and_ejection(tmp_path):
+    replicas = [
+        await make_replica(tmp_path / 'replica_1.db', []),
+        create_engine(f'sqlite+aiosqlite:///{tmp_path / "missing" / "replica_2.db"}', SettingsDataBase()),
+    ]
+    router = ReplicaRouter(primary=TestingSessionLocal, replicas=replicas, eject_seconds=60, pin_seconds=60)
+
+    assert [router.session_factory() for _ in range(4)] == [router.replicas[0], router.replicas[1]] * 2
+
+    with pytest.raises(exc.OperationalError):
+        async with router.replicas[1]() as session:
+            await session.execute(text('SELECT 1'))
+    assert router.healthy_replicas() == [0]
+    assert {router.session_factory() for _ in range(3)} == {router.replicas[0]}
+
+    router._ejected_until[1] = 0
+    assert router.healthy_replicas() == [0, 1]
+
+    router.eject(0)
+    router.eject(1)
+    assert router.session_factory() is TestingSessionLocal
+
+    for engine in replicas:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_read_session_uses_replica_until_write(client, auth_header, test_user, monkeypatch, tmp_path):
+    replica = await make_replica(tmp_path / 'replica.db', [
+        User(id=test_user.id, username=test_user.username, email=test_user.email, hashed_password='password'),
+        Task(title='from_replica', owner_id=test_user.id),
+    ])
+    router = ReplicaRouter(primary=database.async_session, replicas=[replica], eject_seconds=60, pin_seconds=60)
+    monkeypatch.setattr(database, 'replica_router', router)
+    monkeypatch.setattr(crud, 'replica_router', router)
+
+    responce = await client.get('/user/tasks/', headers=auth_header)
+    assert responce.status_code == 200
+    assert [task['title'] for task in responce.json()] == ['from_replica']
+
+    responce = await client.post('/user/tasks/', headers=auth_header, json={'title': 'written_task'})
+    assert responce.status_code == 201
+    created_id = responce.json()['id']
+
+    responce = await client.get('/user/tasks/?limit=100', headers=auth_header)
+    titles = [task['title'] for task in responce.json()]
+    assert 'written_task' in titles and 'from_replica' not in titles
+
+    await client.delete(f'/user/tasks/{created_id}', headers=auth_header)
+    await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_registered_user_reads_from_primary(client, session, monkeypatch, tmp_path):
+    # The replica has not caught up with the registration yet
+    replica = await make_replica(tmp_path / 'replica.db', [])
+    router = ReplicaRouter(primary=database.async_session, replicas=[replica], eject_seconds=60, pin_seconds=60)
+    monkeypatch.setattr(database, 'replica_router', router)
+    monkeypatch.setattr(crud, 'replica_router', router)
+
+    payload = {'username': 'replica_new', 'email': 'replica_new@example.com', 'password': 'password'}
+    responce = await client.post('/auth/register', json=payload)
+    assert responce.status_code == 201
+
+    responce = await client.get('/users/me', headers={'Authorization': f'Bearer {responce.json()["access_token"]}'})
+    assert responce.status_code == 200 and responce.json()['username'] == 'replica_new'
+
+    await session.execute(delete(User).where(User.username=='replica_new'))
+    await session.commit()
+    await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_rejected_requests_do_not_check_out_connections(client):
+    before = connection_hold.stats()
+    bad_token = {'Authorization': 'Bearer not-a-token'}
+
+    responces = [
+        await client.get('/user/tasks/', headers=bad_token),
+        await client.post('/user/tasks/', headers=bad_token, json={'title': ['not', 'a', 'title']}),
+        await client.get('/users/me'),
+    ]
+    assert [responce.status_code for responce in responces] == [401, 401, 401]
+
+    after = connection_hold.stats()
+    assert after['requests'] == before['requests'] + 3
+    assert after['requests_with_connection'] == before['requests_with_connection']
+
+
+@pytest.mark.asyncio
+async def test_connection_hold_time_is_attributed_to_request(tmp_path):
+    engine = create_engine(f'sqlite+aiosqlite:///{tmp_path / "hold.db"}', SettingsDataBase())
+    stats = RequestDbStats()
+    token = request_db_stats.set(stats)
+    try:
+        async with async_sessionmaker(engine)() as session:
+            assert stats.connections == 0
+            await session.execute(text('SELECT 1'))
+    finally:
+        request_db_stats.reset(token)
+
+    assert stats.connections == 1 and stats.connection_hold_seconds > 0
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_statement_leaves_no_timing_state(tmp_path):
+    engine = create_engine(f'sqlite+aiosqlite:///{tmp_path / "failed.db"}', SettingsDataBase())
+    stats = RequestDbStats()
+    token = request_db_stats.set(stats)
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(exc.DBAPIError):
+                await conn.execute(text('SELECT * FROM missing_table'))
+            await conn.execute(text('SELECT 1'))
+            assert 'statement_started_at' not in conn.info
+    finally:
+        request_db_stats.reset(token)
+
+    assert stats.statements == 1 and stats.slowest_statement == 'SELECT 1'
+    await engine.dispose()
@@ -0,0 +1,56 @@
+import pytest
+
+from app.core.metrics import Histogram
+from app.security.limiter import limiter as app_limiter
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('demo_seconds', 'Demo.', (0.1, 1.0), ('route',))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe('/a', value=value)
+
+    assert histogram.render().splitlines()[2:] == [
+        'demo_seconds_bucket{route="/a",le="0.1"} 2',
+        'demo_seconds_bucket{route="/a",le="1.0"} 3',
+        'demo_seconds_bucket{route="/a",le="+Inf"} 4',
+        'demo_seconds_sum{route="/a"} 3.65',
+        'demo_seconds_count{route="/a"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client, auth_header, test_tasks_list):
+    await client.get(f'/user/tasks/{test_tasks_list[0].id}', headers=auth_header)
+    await client.get(f'/user/tasks/{test_tasks_list[1].id}', headers=auth_header)
+    await client.get('/user/tasks/999999', headers=auth_header)
+
+    responce = await client.get('/metrics')
+    assert responce.status_code == 200
+    assert responce.headers['content-type'].startswith('text/plain; version=0.0.4')
+    body = responce.text
+
+    assert 'http_requests_total{method="GET",route="/user/tasks/{task_id}",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="/user/tasks/{task_id}",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/user/tasks/{task_id}",le="+Inf"}' in body
+    assert 'http_requests_in_flight 1' in body
+    assert 'password_hash_pool_rejected ' in body
+    assert 'cache_hits{cache="user"}' in body
+    assert 'db_connection_hold_requests ' in body
+    assert 'db_replicas_healthy 0' in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_count_rate_limit_rejections(client):
+    app_limiter.enabled = True
+    try:
+        statuses = [
+            (await client.post('/auth/login', data={'username': 'nobody', 'password': 'password'})).status_code
+            for _ in range(11)
+        ]
+    finally:
+        app_limiter.reset()
+        app_limiter.enabled = False
+    assert statuses[-1] == 429
+
+    responce = await client.get('/metrics')
+    assert 'rate_limit_rejections_total{route="/auth/login"}' in responce.text
@@ -0,0 +1,162 @@
+import pytest
+from datetime import datetime
+from itertools import product
+from sqlalchemy import create_mock_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.crud import crud
+from app.database.models import Base, Task
+from app.crud.pagination import encode_cursor, encode_sync_token
+from app.schemas.schemas import TaskFilter
+from tests.conftest import engine_test
+
+SORT_KEYS = {
+    'id': 1,
+    'priority': 1,
+    'title': 'task_1',
+    'deadline': datetime(2030, 1, 1),
+    'done': False,
+}
+
+
+async def explain(session, statement, parameters) -> list[str]:
+    connection = await session.connection()
+    result = await connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    return [row[3] for row in result]
+
+
+async def list_query_plan(session, **kwargs) -> list[str]:
+    """Runs the list query once and returns the query plan of the first statement it issued.
+
+    A cursor page that runs out of dated deadlines reads the undated ones with a second statement.
+    """
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(engine_test.sync_engine, 'before_cursor_execute', capture)
+    try:
+        await crud.get_list_tasks_titles(session, offset=0, limit=10, **kwargs)
+    finally:
+        event.remove(engine_test.sync_engine, 'before_cursor_execute', capture)
+
+    statement, parameters = captured[0]
+    return await explain(session, statement, parameters)
+
+
+def assert_no_table_scan(plan: list[str]):
+    steps = [step for step in plan if 'tasks' in step]
+    assert steps, plan
+    # SEARCH means the rows are located through an index on owner_id;
+    # SCAN means the whole table (or a whole index) is read.
+    assert all(step.startswith('SEARCH') for step in steps), plan
+
+
+def assert_cursor_bound_in_index_search(plan: list[str], bound: str):
+    """A cursor page must seek to its position, not search from the start of the owner's rows."""
+    assert_no_table_scan(plan)
+    assert bound in plan[0], plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'sort, sort_order, status_filter, priority_filter',
+    list(product(SORT_KEYS, ['asc', 'desc'], [None, True, False], [None, 2]))
+)
+async def test_list_query_uses_index(session, test_user, test_tasks_list, sort, sort_order, status_filter, priority_filter):
+    filters = dict(
+        user_id=test_user.id,
+        sort_by=sort,
+        sort_order=sort_order,
+        status_filter=status_filter,
+        priority_filter=priority_filter,
+    )
+
+    assert_no_table_scan(await list_query_plan(session, **filters))
+
+    operator = '<' if sort_order == 'desc' else '>'
+    cursor = encode_cursor(sort, sort_order, SORT_KEYS[sort], test_tasks_list[3].id)
+    assert_cursor_bound_in_index_search(await list_query_plan(session, cursor=cursor, **filters), f'{sort}{operator}?')
+
+    if sort == 'deadline':
+        # Undated tasks are positioned by id alone
+        cursor = encode_cursor(sort, sort_order, None, test_tasks_list[3].id)
+        assert_cursor_bound_in_index_search(await list_query_plan(session, cursor=cursor, **filters), f'id{operator}?')
+
+
+# Delta sync reads whole task rows through its (owner_id, change_seq, id) index, so it covers nothing.
+LIST_INDEXES = [index for index in Task.__table__.indexes if index.name != 'ix_tasks_owner_id_change_seq_id']
+
+@pytest.mark.parametrize('index', sorted(LIST_INDEXES, key=lambda index: index.name), ids=lambda index: index.name)
+def test_list_indexes_cover_summary_projection(index):
+    """Every list index carries all columns the list query reads, so PostgreSQL can use an index-only scan."""
+    needed = {column.key for column in crud.TASK_SUMMARY_COLUMNS} | {'owner_id', 'done', 'priority'}
+    key_columns = {column.name for column in index.columns}
+    included = set(index.dialect_options['postgresql']['include'])
+
+    assert needed <= key_columns | included
+    assert 'INCLUDE' in str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_search_query_uses_fts_index(session, test_user, test_tasks_list):
+    plan = await list_query_plan(session, user_id=test_user.id, sort_by='id', search='task_1')
+
+    assert any(step.startswith('SCAN tasks_fts VIRTUAL TABLE INDEX') for step in plan), plan
+    assert [step for step in plan if ' tasks ' in f'{step} '] == ['SEARCH tasks USING INTEGER PRIMARY KEY (rowid=?)'], plan
+
+
+def test_search_index_ddl_on_postgresql():
+    statements = []
+    engine = create_mock_engine('postgresql+asyncpg://', lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=engine.dialect))))
+    Base.metadata.create_all(engine, checkfirst=False)
+
+    assert any('GENERATED ALWAYS AS (to_tsvector(' in statement for statement in statements)
+    assert 'CREATE INDEX ix_tasks_owner_id_search_vector ON tasks USING gin (owner_id, search_vector)' in statements
+    assert not any('tasks_fts' in statement for statement in statements)
+
+
+# filters: the index and range condition SQLite should search with
+RANGE_FILTERS = [
+    (TaskFilter(deadline_after=datetime(2030, 1, 1), deadline_before=datetime(2030, 1, 8)), 'owner_id=? AND deadline>? AND deadline<?'),
+    (TaskFilter(deadline_before=datetime(2030, 1, 8)), 'owner_id=? AND deadline<?'),
+    (TaskFilter(overdue=True), 'owner_id=? AND deadline<?'),
+    (TaskFilter(created_after=datetime(2030, 1, 1), created_before=datetime(2031, 1, 1)), 'owner_id=? AND created_at>? AND created_at<?'),
+    (TaskFilter(created_after=datetime(2030, 1, 1)), 'owner_id=? AND created_at>?'),
+    (TaskFilter(priority_min=3), 'owner_id=? AND priority>?'),
+    (TaskFilter(priority_min=3, priority_max=4), 'owner_id=? AND priority>? AND priority<?'),
+]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('filters, search', RANGE_FILTERS, ids=lambda value: str(value.model_dump(exclude_none=True)) if isinstance(value, TaskFilter) else '')
+@pytest.mark.parametrize('sort', list(SORT_KEYS))
+async def test_range_filters_use_index(session, test_user, test_tasks_list, filters, search, sort):
+    plan = await list_query_plan(session, user_id=test_user.id, sort_by=sort, filters=filters)
+
+    assert_no_table_scan(plan)
+    assert f'({search})' in plan[0], plan
+
+
+@pytest.mark.asyncio
+async def test_task_changes_use_change_seq_indexes(session, test_user, test_tasks_list):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'change_seq' in statement:
+            captured.append((statement, parameters))
+
+    # A mid-page token, which positions the scans by (change_seq, id)
+    event.listen(engine_test.sync_engine, 'before_cursor_execute', capture)
+    try:
+        await crud.get_task_changes(session, test_user.id, encode_sync_token(0, 0), limit=10)
+    finally:
+        event.remove(engine_test.sync_engine, 'before_cursor_execute', capture)
+
+    plans = [await explain(session, statement, parameters) for statement, parameters in captured]
+    assert len(plans) == 2
+    assert any('ix_tasks_owner_id_change_seq_id (owner_id=? AND change_seq>?' in step for step in plans[0]), plans[0]
+    assert any('ix_task_tombstones_owner_id_change_seq_task_id (owner_id=? AND change_seq>?' in step for step in plans[1]), plans[1]
+    assert not any('TEMP B-TREE' in step for plan in plans for step in plan), plans
@@ -1,16 +1,26 @@
+import asyncio
+import threading
+import time
 import pytest
 import jwt
 from datetime import timedelta
 
 from app.database.models import User
 from app.core.config import settings
-from app.core.exceptions import InvalidTokenTypeError, ExpiredTokenError, InvalidTokenError, InvalidCredentialsError
+from app.core.exceptions import InvalidTokenTypeError, ExpiredTokenError, InvalidTokenError, InvalidCredentialsError, ServiceUnavailableError
+from app.security import security
+from app.security.hashing import PasswordHashPool, hash_pool
+from app.core.cache import token_cache
 from app.security.security import (get_password_hash, 
                                    verify_password, create_jwt, 
                                    create_access_token, 
                                    create_refresh_token,
                                    decode_jwt_token,
-                                   get_current_user)
+                                   get_current_user,
+                                   get_password_hash_async,
+                                   verify_password_async,
+                                   revoke_user_tokens,
+                                   TokenRevocations)
 
 
 
@@ -97,4 +107,98 @@ async def test_get_current_user(session):
     invalid_token = 'invalid_token'
     with pytest.raises(InvalidTokenError):
         await get_current_user(invalid_token, session=session)
-    
\ No newline at end of file
+    
+
+@pytest.mark.asyncio
+async def test_password_hash_async():
+    hashed = await get_password_hash_async('secret')
+
+    assert await verify_password_async('secret', hashed) is True
+    assert await verify_password_async('wrong_pass', hashed) is False
+
+
+@pytest.mark.asyncio
+async def test_password_hash_pool_backpressure():
+    pool = PasswordHashPool(workers=1, queue_size=1)
+    release = threading.Event()
+
+    running = [asyncio.create_task(pool.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    assert pool.stats()['in_flight'] == 2 and pool.stats()['queued'] == 1
+
+    with pytest.raises(ServiceUnavailableError):
+        await pool.run(release.wait, 5)
+    assert pool.stats()['rejected'] == 1
+
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+    assert pool.stats()['in_flight'] == 0 and pool.stats()['completed'] == 2
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_login_with_saturated_hash_pool(client, test_user, monkeypatch):
+    monkeypatch.setattr(hash_pool, 'workers', 1)
+    monkeypatch.setattr(hash_pool, 'queue_size', 0)
+    monkeypatch.setattr(hash_pool, 'in_flight', 1)
+
+    responce = await client.post('/auth/login', data={'username': test_user.username, 'password': 'password'})
+    assert responce.status_code == 503
+    assert responce.headers['Retry-After'] == '1'
+    assert responce.json() == {'detail': 'Service is temporarily overloaded, please retry later.'}
+
+
+@pytest.mark.asyncio
+async def test_stateless_auth_skips_user_lookup(client, test_user, auth_header, test_tasks_list, monkeypatch):
+    monkeypatch.setattr(settings, 'STATELESS_AUTH', True)
+
+    async def fail_lookup(*args, **kwargs):
+        raise AssertionError('users row must not be loaded')
+    monkeypatch.setattr(security, 'get_user_by_id', fail_lookup)
+
+    responce = await client.get('/user/tasks/?limit=5', headers=auth_header)
+    assert responce.status_code == 200 and len(responce.json()) == 5
+
+    responce = await client.get('/users/me', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.json() == {'id': test_user.id, 'username': test_user.username, 'email': test_user.email}
+
+    revoke_user_tokens(test_user.id)
+    responce = await client.get('/user/tasks/?limit=5', headers=auth_header)
+    assert responce.status_code == 401
+
+    fresh_token = create_access_token(test_user)
+    responce = await client.get('/user/tasks/?limit=5', headers={'Authorization': f'Bearer {fresh_token}'})
+    assert responce.status_code == 200
+
+
+def test_token_revocations_expire():
+    revocations = TokenRevocations(ttl_seconds=60)
+    revocations.revoke(1)
+
+    assert revocations.is_revoked(1, time.time() - 1)
+    assert not revocations.is_revoked(1, time.time() + 1)
+    assert not revocations.is_revoked(2, time.time() - 1)
+
+    revocations._revoked_at[1] -= 120
+    revocations.revoke(2)
+    assert not revocations.is_revoked(1, 0)
+
+
+def test_decode_jwt_token_cache(monkeypatch):
+    token = create_jwt({'sub': '1', 'type': 'access'}, timedelta(minutes=5))
+    decoded = decode_jwt_token(token, expected_type='access')
+    hits = token_cache.stats()['hits']
+
+    assert decode_jwt_token(token, expected_type='access') == decoded
+    assert token_cache.stats()['hits'] == hits + 1
+
+    #Type check still applies to cached payloads
+    with pytest.raises(InvalidTokenTypeError):
+        decode_jwt_token(token, expected_type='refresh')
+
+    #Cached payload past its exp
+    expired_at = decoded['exp'] + 1
+    monkeypatch.setattr(security.time, 'time', lambda: expired_at)
+    with pytest.raises(ExpiredTokenError):
+        decode_jwt_token(token, expected_type='access')
@@ -0,0 +1,133 @@
+import logging
+import pytest
+
+from app.core.config import settings
+
+
+def statement_kinds(statements: list[str]) -> list[str]:
+    return [' '.join(statement.split()[:3]) for statement in statements]
+
+
+@pytest.mark.asyncio
+async def test_task_write_statements(client, auth_header, test_tasks_list, sql_statements):
+    #The first request loads the user into the user cache
+    await client.get('/users/me', headers=auth_header)
+
+    sql_statements.clear()
+    responce = await client.post('/user/tasks/', headers=auth_header, json={'title': 'counted_task'})
+    assert responce.status_code == 201 and responce.json()['created_at']
+    assert statement_kinds(sql_statements) == ['UPDATE users SET', 'INSERT INTO tasks']
+    task_id = responce.json()['id']
+
+    sql_statements.clear()
+    responce = await client.put(f'/user/tasks/{task_id}', headers=auth_header, json={'title': 'renamed', 'done': True})
+    assert responce.status_code == 200 and responce.json()['completed_at']
+    assert statement_kinds(sql_statements) == ['UPDATE users SET', 'UPDATE tasks SET']
+
+    sql_statements.clear()
+    responce = await client.delete(f'/user/tasks/{task_id}', headers=auth_header)
+    assert responce.status_code == 204
+    assert statement_kinds(sql_statements) == ['UPDATE users SET', 'DELETE FROM tasks', 'INSERT INTO task_tombstones']
+
+
+@pytest.mark.asyncio
+async def test_task_counter_statements(client, auth_header, test_tasks_list, sql_statements, monkeypatch):
+    monkeypatch.setattr(settings, 'TASK_COUNTERS_ENABLED', True)
+    await client.get('/users/me', headers=auth_header)
+
+    sql_statements.clear()
+    responce = await client.post('/user/tasks/', headers=auth_header, json={'title': 'counted_task'})
+    assert statement_kinds(sql_statements) == ['UPDATE users SET', 'INSERT INTO tasks', 'INSERT INTO task_counters']
+    task_id = responce.json()['id']
+
+    # Renaming does not touch the counters
+    sql_statements.clear()
+    await client.put(f'/user/tasks/{task_id}', headers=auth_header, json={'title': 'renamed'})
+    assert statement_kinds(sql_statements) == ['UPDATE users SET', 'UPDATE tasks SET']
+
+    sql_statements.clear()
+    await client.put(f'/user/tasks/{task_id}', headers=auth_header, json={'done': True})
+    assert statement_kinds(sql_statements) == [
+        'UPDATE users SET', 'SELECT tasks.priority, tasks.done,', 'UPDATE tasks SET', 'INSERT INTO task_counters', 'INSERT INTO task_completion_buckets']
+
+    sql_statements.clear()
+    responce = await client.get('/user/tasks/stats', headers=auth_header)
+    assert responce.status_code == 200
+    assert statement_kinds(sql_statements) == ['SELECT task_counters.priority, task_counters.total,', 'SELECT task_completion_buckets.bucket, task_completion_buckets.completed']
+
+    sql_statements.clear()
+    await client.delete(f'/user/tasks/{task_id}', headers=auth_header)
+    assert statement_kinds(sql_statements) == [
+        'UPDATE users SET', 'DELETE FROM tasks', 'INSERT INTO task_tombstones', 'INSERT INTO task_counters', 'INSERT INTO task_completion_buckets']
+
+
+@pytest.mark.asyncio
+async def test_user_write_statements(client, test_user, auth_header, sql_statements):
+    await client.get('/users/me', headers=auth_header)
+
+    sql_statements.clear()
+    payload = {'username': 'counted_user', 'email': 'counted_user@example.com', 'password': 'password'}
+    responce = await client.put('/users/me', headers=auth_header, json=payload)
+    assert responce.status_code == 200 and responce.json()['username'] == 'counted_user'
+    assert statement_kinds(sql_statements) == ['UPDATE users SET']
+
+
+@pytest.mark.asyncio
+async def test_register_statements(client, session, sql_statements):
+    payload = {'username': 'counted_new', 'email': 'counted_new@example.com', 'password': 'password'}
+    responce = await client.post('/auth/register', json=payload)
+    assert responce.status_code == 201
+    assert statement_kinds(sql_statements) == ['SELECT users.id, users.username,', 'INSERT INTO users']
+
+
+# Statement budget per route, checked with the X-DB-Statements header.
+# The first request of each test also loads the current user. The list reads
+# users.tasks_version for its ETag and task writes bump it; deletes also leave a tombstone.
+ROUTE_STATEMENT_BUDGETS = [
+    ('GET', '/users/me', 0),
+    ('GET', '/user/tasks/?limit=10&sort=priority', 2),
+    ('GET', '/user/tasks/?limit=10&overdue=true', 1),
+    ('GET', '/user/tasks/{task_id}', 1),
+    ('PUT', '/user/tasks/{task_id}', 2),
+    ('DELETE', '/user/tasks/{task_id}', 3),
+    ('GET', '/user/tasks/changes?limit=10', 2),
+    ('GET', '/user/tasks/stats', 1),
+]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('method, url, budget', ROUTE_STATEMENT_BUDGETS)
+async def test_route_statement_budget(client, auth_header, test_tasks_list, db_stats_headers, method, url, budget):
+    responce = await client.get('/users/me', headers=auth_header)
+    assert int(responce.headers['X-DB-Statements']) == 1
+
+    url = url.format(task_id=test_tasks_list[0].id)
+    json = {'title': 'budget_task'} if method == 'PUT' else None
+    responce = await client.request(method, url, headers=auth_header, json=json)
+    assert responce.status_code < 300, responce.text
+    assert int(responce.headers['X-DB-Statements']) <= budget
+    assert float(responce.headers['X-DB-Time-Ms']) >= float(responce.headers['X-DB-Slowest-Ms']) >= 0
+    if method == 'DELETE':
+        test_tasks_list.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_repeated_statements_are_reported(client, auth_header, test_tasks_list, monkeypatch, caplog):
+    monkeypatch.setattr(settings, 'DB_REPEATED_STATEMENT_THRESHOLD', 3)
+    await client.get('/users/me', headers=auth_header)
+
+    payload = {'mode': 'best_effort', 'operations': [
+        {'op': 'update', 'id': task.id, 'data': {'title': f'repeat_{i}'}} for i, task in enumerate(test_tasks_list[:4])
+    ]}
+    with caplog.at_level(logging.WARNING, logger='app.database.instrumentation'):
+        responce = await client.post('/user/tasks/batch', headers=auth_header, json=payload)
+    assert responce.status_code == 200
+
+    record, = [record for record in caplog.records if 'possible N+1' in record.getMessage()]
+    assert 'UPDATE tasks' in record.getMessage()
+    assert record.db_statements >= 4
+
+
+@pytest.mark.asyncio
+async def test_db_stats_headers_are_opt_in(client, auth_header):
+    responce = await client.get('/users/me', headers=auth_header)
+    assert 'X-DB-Statements' not in responce.headers
@@ -1,9 +1,19 @@
-from datetime import datetime
+import csv
+import io
+import json
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+from typing import List
 import pytest
+from pydantic import TypeAdapter
 from sqlalchemy import delete, select
 
-from app.database.models import Task
+from app.database.models import Task, TaskTombstone, User
 from app.security.security import decode_jwt_token
+from app.core.config import settings
+from app.crud import crud
+from app.crud.pagination import encode_cursor
+from app.schemas.schemas import TaskSummary
 
 @pytest.mark.asyncio
 async def test_create_task(client, auth_header, session):
@@ -120,4 +130,565 @@ async def test_delete_task(client, auth_header, session):
     assert responce.status_code == 204
 
     first_task = await session.scalar(select(Task).where(Task.id==1))
-    assert first_task is None
\ No newline at end of file
+    assert first_task is None
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('sort', ['id', 'priority', 'title', 'deadline', 'done'])
+@pytest.mark.parametrize('sort_order', ['asc', 'desc'])
+@pytest.mark.parametrize('limit', [1, 4])
+async def test_get_tasks_list_cursor(client, auth_header, test_user, test_tasks_list, session, sort, sort_order, limit):
+    # Pages cross from dated to undated tasks and back, and end on undated ones
+    no_deadline_tasks = [Task(title=f'no_deadline_task_{i}', priority=1, done=True, owner_id=test_user.id) for i in range(2)]
+    session.add_all(no_deadline_tasks)
+    await session.commit()
+
+    responce = await client.get(f'/user/tasks/?limit=100&sort={sort}&sort_order={sort_order}', headers=auth_header)
+    assert responce.status_code == 200
+    expected = [task['id'] for task in responce.json()]
+
+    collected = []
+    url = f'/user/tasks/?limit={limit}&sort={sort}&sort_order={sort_order}'
+    responce = await client.get(url, headers=auth_header)
+    while True:
+        assert responce.status_code == 200, responce.text
+        collected += [task['id'] for task in responce.json()]
+        next_cursor = responce.headers.get('X-Next-Cursor')
+        if not next_cursor:
+            break
+        responce = await client.get(f'{url}&cursor={next_cursor}', headers=auth_header)
+
+    assert collected == expected
+
+    for task in no_deadline_tasks:
+        await session.delete(task)
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_get_tasks_list_invalid_cursor(client, auth_header, test_tasks_list):
+    responce = await client.get('/user/tasks/?limit=5&sort=id', headers=auth_header)
+    next_cursor = responce.headers['X-Next-Cursor']
+
+    responce = await client.get(f'/user/tasks/?limit=5&sort=title&cursor={next_cursor}', headers=auth_header)
+    assert responce.status_code == 422
+
+    responce = await client.get('/user/tasks/?limit=5&sort=id&cursor=not-a-cursor', headers=auth_header)
+    assert responce.status_code == 422
+
+    # Sort keys of the wrong type never reach the database
+    for sort, sort_key in [('priority', {'a': 1}), ('priority', '1'), ('id', True), ('title', 1), ('done', 0), ('deadline', 5), ('title', None)]:
+        cursor = encode_cursor(sort, 'asc', sort_key, 1)
+        responce = await client.get('/user/tasks/', params={'limit': 5, 'sort': sort, 'cursor': cursor}, headers=auth_header)
+        assert responce.status_code == 422, (sort, sort_key)
+
+@pytest.mark.asyncio
+async def test_update_and_delete_task_access(client, auth_header, session):
+    other_user = User(username='other_user', email='other_user@example.com', hashed_password='password')
+    session.add(other_user)
+    await session.commit()
+    foreign_task = Task(title='foreign_task', owner_id=other_user.id)
+    session.add(foreign_task)
+    await session.commit()
+
+    payload = {'title': 'stolen', 'description': None, 'deadline': None, 'done': None}
+
+    responce = await client.put(f'/user/tasks/{foreign_task.id}', headers=auth_header, json=payload)
+    assert responce.status_code == 403
+    responce = await client.delete(f'/user/tasks/{foreign_task.id}', headers=auth_header)
+    assert responce.status_code == 403
+
+    responce = await client.put('/user/tasks/999999', headers=auth_header, json=payload)
+    assert responce.status_code == 404
+    responce = await client.delete('/user/tasks/999999', headers=auth_header)
+    assert responce.status_code == 404
+
+    await session.refresh(foreign_task)
+    assert foreign_task.title == 'foreign_task'
+
+    await session.delete(foreign_task)
+    await session.delete(other_user)
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_tasks_batch_best_effort(client, auth_header, test_user, test_tasks_list, session):
+    payload = {
+        'mode': 'best_effort',
+        'operations': [
+            {'op': 'create', 'data': {'title': 'batch_task_1'}},
+            {'op': 'update', 'id': test_tasks_list[0].id, 'data': {'title': 'batch_update', 'done': True}},
+            {'op': 'update', 'id': 999999, 'data': {'title': 'missing'}},
+            {'op': 'create', 'data': {'title': ''}},
+            {'op': 'delete', 'id': test_tasks_list[1].id},
+            {'op': 'create', 'data': {'title': 'batch_task_2', 'priority': 3}},
+        ]
+    }
+
+    responce = await client.post('/user/tasks/batch', headers=auth_header, json=payload)
+    assert responce.status_code == 200, responce.text
+    data = responce.json()
+    assert data['committed'] is True
+    assert [item['status_code'] for item in data['results']] == [201, 200, 404, 422, 204, 201]
+    assert [item['index'] for item in data['results']] == list(range(6))
+    assert data['results'][1]['task']['title'] == 'batch_update' and data['results'][1]['task']['done'] is True
+
+    created_ids = [data['results'][0]['id'], data['results'][5]['id']]
+    created = (await session.scalars(select(Task).where(Task.id.in_(created_ids)).order_by(Task.id))).all()
+    assert [task.title for task in created] == ['batch_task_1', 'batch_task_2']
+    assert all(task.owner_id == test_user.id for task in created)
+    assert await session.scalar(select(Task).where(Task.id==test_tasks_list[1].id)) is None
+
+    test_tasks_list.pop(1)
+    for task in created:
+        await session.delete(task)
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_tasks_batch_atomic(client, auth_header, test_tasks_list, session):
+    deleted_id = test_tasks_list[2].id
+    payload = {
+        'operations': [
+            {'op': 'create', 'data': {'title': 'atomic_task'}},
+            {'op': 'delete', 'id': deleted_id},
+            {'op': 'update', 'id': 999999, 'data': {'title': 'missing'}},
+        ]
+    }
+
+    responce = await client.post('/user/tasks/batch', headers=auth_header, json=payload)
+    assert responce.status_code == 404, responce.text
+    data = responce.json()
+    assert data['committed'] is False
+    assert [item['status_code'] for item in data['results']] == [424, 424, 404]
+
+    assert await session.scalar(select(Task).where(Task.title=='atomic_task')) is None
+    assert await session.scalar(select(Task).where(Task.id==deleted_id)) is not None
+
+    payload['operations'].pop()
+    responce = await client.post('/user/tasks/batch', headers=auth_header, json=payload)
+    assert responce.status_code == 200, responce.text
+    assert responce.json()['committed'] is True
+
+    test_tasks_list.pop(2)
+    await session.execute(delete(Task).where(Task.title=='atomic_task'))
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_tasks_batch_limit(client, auth_header):
+    payload = {'operations': [{'op': 'delete', 'id': i} for i in range(settings.TASK_BATCH_MAX_OPERATIONS + 1)]}
+
+    responce = await client.post('/user/tasks/batch', headers=auth_header, json=payload)
+    assert responce.status_code == 422
+
+@pytest.mark.asyncio
+async def test_get_tasks_list_matches_response_model(client, auth_header, test_user, test_tasks_list, session):
+    task = Task(title='Ünicode "quoted"', deadline=datetime(2030, 1, 2, 3, 4, 5, 600000), done=True, owner_id=test_user.id)
+    session.add(task)
+    await session.commit()
+
+    responce = await client.get('/user/tasks/?limit=100&sort=deadline', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.headers['content-type'] == 'application/json'
+    rows = responce.json()
+    adapter = TypeAdapter(List[TaskSummary])
+    assert responce.content == adapter.dump_json(adapter.validate_python(rows))
+    assert next(row for row in rows if row['id'] == task.id) == {'id': task.id, 'title': 'Ünicode "quoted"', 'deadline': '2030-01-02T03:04:05.600000', 'done': True}
+
+    await session.delete(task)
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_export_tasks(client, auth_header, test_user, test_tasks_list, session, monkeypatch):
+    monkeypatch.setattr(settings, 'TASK_EXPORT_BATCH_SIZE', 4)
+    session.add(Task(title='exported, "quoted"', deadline=datetime(2030, 1, 2, 3, 4, 5), priority=4, owner_id=test_user.id))
+    await session.commit()
+
+    responce = await client.get('/user/tasks/export', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.headers['content-type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in responce.text.splitlines()]
+    expected_ids = (await session.scalars(select(Task.id).where(Task.owner_id == test_user.id).order_by(Task.id))).all()
+    assert [row['id'] for row in rows] == expected_ids
+    assert rows[-1]['title'] == 'exported, "quoted"' and rows[-1]['deadline'] == '2030-01-02T03:04:05'
+    assert set(rows[0]) == {'id', 'title', 'description', 'deadline', 'priority', 'created_at', 'done', 'completed_at'}
+
+    responce = await client.get('/user/tasks/export?format=csv&priority=4&sort=title&sort_order=desc', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.headers['content-type'].startswith('text/csv')
+    header, *records = list(csv.reader(io.StringIO(responce.text)))
+    assert header == ['id', 'title', 'description', 'deadline', 'priority', 'created_at', 'done', 'completed_at']
+    assert [record[1] for record in records] == ['exported, "quoted"']
+    assert records[0][3] == '2030-01-02T03:04:05'
+
+    await session.execute(delete(Task).where(Task.title == 'exported, "quoted"'))
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_export_tasks_empty(client, auth_header):
+    responce = await client.get('/user/tasks/export?format=csv&priority=99', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.text.splitlines() == ['id,title,description,deadline,priority,created_at,done,completed_at']
+
+    responce = await client.get('/user/tasks/export?priority=99', headers=auth_header)
+    assert responce.status_code == 200 and responce.content == b''
+
+@pytest.mark.asyncio
+async def test_search_tasks(client, auth_header, test_user, test_tasks_list, session):
+    other_user = User(username='search_other', email='search_other@example.com', hashed_password='password')
+    session.add(other_user)
+    await session.commit()
+    tasks = [
+        Task(title='Buy milk', description='and bread from the shop', owner_id=test_user.id),
+        Task(title='Call the shop', description='ask about milk, milk and more milk', owner_id=test_user.id),
+        Task(title='Milk the cow', description=None, done=True, owner_id=test_user.id),
+        Task(title='Buy milk', description='not mine', owner_id=other_user.id),
+    ]
+    session.add_all(tasks)
+    await session.commit()
+
+    responce = await client.get('/user/tasks/?q=milk', headers=auth_header)
+    assert responce.status_code == 200
+    assert sorted(task['id'] for task in responce.json()) == sorted(task.id for task in tasks[:3])
+    assert set(responce.json()[0]) == {'id', 'title', 'deadline', 'done'}
+    assert 'X-Next-Cursor' not in responce.headers
+
+    # Title matches rank above description matches
+    responce = await client.get('/user/tasks/?q=SHOP&status=false', headers=auth_header)
+    assert [task['title'] for task in responce.json()] == ['Call the shop', 'Buy milk']
+
+    # Including non-ASCII text, which SQLite's lower() leaves as is
+    session.add_all([
+        Task(title='Купить хлеб', description='зайти в магазин', owner_id=test_user.id),
+        Task(title='Позвонить в МАГАЗИН', description=None, owner_id=test_user.id),
+    ])
+    await session.commit()
+    responce = await client.get('/user/tasks/?q=Магазин', headers=auth_header)
+    assert [task['title'] for task in responce.json()] == ['Позвонить в МАГАЗИН', 'Купить хлеб']
+
+    responce = await client.get('/user/tasks/?q=milk shop', headers=auth_header)
+    assert sorted(task['id'] for task in responce.json()) == sorted(task.id for task in tasks[:2])
+
+    responce = await client.get('/user/tasks/?q=milk&limit=2&page=2', headers=auth_header)
+    assert len(responce.json()) == 1
+
+    # FTS query syntax in the input is searched for literally
+    for q in ('"milk', 'milk OR NOT', 'owner_id:1', '*', 'NEAR(milk)'):
+        responce = await client.get('/user/tasks/', params={'q': q}, headers=auth_header)
+        assert responce.status_code == 200, q
+
+    responce = await client.get('/user/tasks/?q=Cow', headers=auth_header)
+    assert [task['id'] for task in responce.json()] == [tasks[2].id]
+
+    task = tasks[2]
+    responce = await client.put(f'/user/tasks/{task.id}', headers=auth_header, json={'title': 'Feed the goat'})
+    assert responce.status_code == 200
+    assert (await client.get('/user/tasks/?q=cow', headers=auth_header)).json() == []
+    assert [task['id'] for task in (await client.get('/user/tasks/?q=goat', headers=auth_header)).json()] == [task.id]
+
+    await client.delete(f'/user/tasks/{task.id}', headers=auth_header)
+    assert (await client.get('/user/tasks/?q=goat', headers=auth_header)).json() == []
+
+    responce = await client.get(f'/user/tasks/?q=milk&cursor=abc', headers=auth_header)
+    assert responce.status_code == 422
+
+    await session.execute(delete(Task).where(Task.id.in_([task.id for task in tasks])))
+    await session.delete(other_user)
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_get_tasks_list_range_filters(client, auth_header, test_user, session):
+    now = datetime.now()
+    tasks = {
+        'overdue': Task(title='overdue', deadline=now - timedelta(days=2), priority=4, owner_id=test_user.id),
+        'overdue_done': Task(title='overdue_done', deadline=now - timedelta(days=2), done=True, priority=1, owner_id=test_user.id),
+        'this_week': Task(title='this_week', deadline=now + timedelta(days=3), priority=3, owner_id=test_user.id),
+        'next_month': Task(title='next_month', deadline=now + timedelta(days=30), priority=5, owner_id=test_user.id,
+                           created_at=now - timedelta(days=100)),
+        'no_deadline': Task(title='no_deadline', priority=0, owner_id=test_user.id),
+    }
+    session.add_all(tasks.values())
+    await session.commit()
+
+    async def titles(query: str) -> set[str]:
+        responce = await client.get(f'/user/tasks/?limit=100&{query}', headers=auth_header)
+        assert responce.status_code == 200, responce.text
+        return {task['title'] for task in responce.json()} & set(tasks)
+
+    week = {'deadline_after': now.isoformat(), 'deadline_before': (now + timedelta(days=7)).isoformat()}
+    assert await titles(urlencode(week)) == {'this_week'}
+    assert await titles('overdue=true') == {'overdue'}
+    assert await titles('overdue=false') == {'overdue_done', 'this_week', 'next_month', 'no_deadline'}
+    assert await titles('priority_min=3') == {'overdue', 'this_week', 'next_month'}
+    assert await titles('priority_min=3&priority_max=4&sort=priority') == {'overdue', 'this_week'}
+    assert await titles(urlencode({'created_before': (now - timedelta(days=50)).isoformat()})) == {'next_month'}
+    assert await titles(urlencode({'created_after': (now - timedelta(days=50)).isoformat(), 'status': 'false', 'priority_max': 3})) == {'this_week', 'no_deadline'}
+
+    responce = await client.get('/user/tasks/?priority_min=6', headers=auth_header)
+    assert responce.status_code == 422
+
+    responce = await client.get('/user/tasks/export?overdue=true', headers=auth_header)
+    assert [json.loads(line)['title'] for line in responce.text.splitlines()] == ['overdue']
+
+    await session.execute(delete(Task).where(Task.id.in_([task.id for task in tasks.values()])))
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_get_task_stats(client, auth_header, test_user, session):
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.commit()
+
+    responce = await client.get('/user/tasks/stats', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.json() == {'total': 0, 'open': 0, 'done': 0, 'overdue': 0, 'by_priority': {},
+                               'completion_rate': None, 'median_completion_seconds': None}
+
+    now = datetime.now()
+    created_at = now - timedelta(days=1)
+    session.add_all([
+        Task(title='overdue', deadline=now - timedelta(hours=1), priority=2, owner_id=test_user.id),
+        Task(title='open', deadline=now + timedelta(days=1), priority=2, owner_id=test_user.id),
+        Task(title='no_priority', priority=None, owner_id=test_user.id),
+        *(Task(title=f'done_{seconds}', priority=5, done=True, deadline=now - timedelta(hours=1), created_at=created_at,
+               completed_at=created_at + timedelta(seconds=seconds), owner_id=test_user.id)
+          for seconds in (60, 120, 600)),
+    ])
+    await session.commit()
+
+    responce = await client.get('/user/tasks/stats', headers=auth_header)
+    assert responce.status_code == 200
+    assert responce.json() == {'total': 6, 'open': 3, 'done': 3, 'overdue': 1, 'by_priority': {'0': 1, '2': 2, '5': 3},
+                               'completion_rate': 0.5, 'median_completion_seconds': pytest.approx(120)}
+
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id, Task.title == 'done_600'))
+    await session.commit()
+    responce = await client.get('/user/tasks/stats', headers=auth_header)
+    assert responce.json()['median_completion_seconds'] == pytest.approx(90)
+
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.commit()
+
+@pytest.mark.asyncio
+async def test_task_counters_follow_writes(client, auth_header, test_user, session, monkeypatch):
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    now = datetime.now()
+    session.add_all(Task(title=f'done_{seconds}', priority=1, done=True, created_at=now - timedelta(days=1),
+                         completed_at=now - timedelta(days=1) + timedelta(seconds=seconds), owner_id=test_user.id)
+                    for seconds in (60, 120, 600))
+    await session.commit()
+
+    monkeypatch.setattr(settings, 'TASK_COUNTERS_ENABLED', True)
+    await crud.rebuild_task_counters(session, test_user.id)
+
+    async def stats(counters: bool) -> dict:
+        monkeypatch.setattr(settings, 'TASK_COUNTERS_ENABLED', counters)
+        responce = await client.get('/user/tasks/stats', headers=auth_header)
+        monkeypatch.setattr(settings, 'TASK_COUNTERS_ENABLED', True)
+        assert responce.status_code == 200
+        return responce.json()
+
+    # The median is estimated from the completion buckets
+    from_counters = await stats(counters=True)
+    assert from_counters.pop('median_completion_seconds') == pytest.approx(120, rel=0.19)
+    assert from_counters == {'total': 3, 'open': 0, 'done': 3, 'overdue': 0, 'by_priority': {'1': 3},
+                             'completion_rate': 1.0}
+
+    ids = []
+    for priority in (2, 3, 3, 5):
+        responce = await client.post('/user/tasks/', headers=auth_header,
+                                     json={'title': f'counted_{priority}', 'priority': priority,
+                                           'deadline': (now - timedelta(hours=1)).isoformat()})
+        ids.append(responce.json()['id'])
+    await client.put(f'/user/tasks/{ids[0]}', headers=auth_header, json={'done': True})
+    await client.put(f'/user/tasks/{ids[1]}', headers=auth_header, json={'priority': 4})
+    await client.put(f'/user/tasks/{ids[2]}', headers=auth_header, json={'title': 'renamed'})
+    await client.delete(f'/user/tasks/{ids[3]}', headers=auth_header)
+    responce = await client.post('/user/tasks/batch', headers=auth_header, json={'mode': 'best_effort', 'operations': [
+        {'op': 'create', 'data': {'title': 'batched', 'priority': 5}},
+        {'op': 'update', 'id': ids[2], 'data': {'done': True, 'priority': 1}},
+        {'op': 'delete', 'id': -1},
+    ]})
+    assert responce.json()['committed'] is True
+
+    from_counters, from_tasks = await stats(counters=True), await stats(counters=False)
+    assert from_tasks['median_completion_seconds'] == pytest.approx(60)
+    assert from_counters.pop('median_completion_seconds') == pytest.approx(from_tasks.pop('median_completion_seconds'), rel=0.19)
+    assert from_counters == from_tasks == {'total': 7, 'open': 2, 'done': 5, 'overdue': 1, 'by_priority': {'1': 4, '2': 1, '4': 1, '5': 1},
+                                           'completion_rate': pytest.approx(5 / 7)}
+
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.commit()
+    await crud.rebuild_task_counters(session, test_user.id)
+    assert (await stats(counters=True))['total'] == 0
+
+@pytest.mark.asyncio
+async def test_get_one_task_etag(client, auth_header, test_tasks_list):
+    task = test_tasks_list[0]
+    responce = await client.get(f'/user/tasks/{task.id}', headers=auth_header)
+    etag = responce.headers['ETag']
+
+    responce = await client.get(f'/user/tasks/{task.id}', headers={**auth_header, 'If-None-Match': etag})
+    assert responce.status_code == 304 and responce.content == b'' and responce.headers['ETag'] == etag
+    responce = await client.get(f'/user/tasks/{task.id}', headers={**auth_header, 'If-None-Match': f'"other", W/{etag}'})
+    assert responce.status_code == 304
+
+    responce = await client.put(f'/user/tasks/{task.id}', headers=auth_header, json={'title': 'changed'})
+    new_etag = responce.headers['ETag']
+    assert new_etag != etag
+
+    responce = await client.get(f'/user/tasks/{task.id}', headers={**auth_header, 'If-None-Match': etag})
+    assert responce.status_code == 200 and responce.json()['title'] == 'changed'
+    assert responce.headers['ETag'] == new_etag
+
+    # SQLite hands the id of a deleted last row to the next insert; the new task gets a new tag
+    responce = await client.post('/user/tasks/', headers=auth_header, json={'title': 'reused_id'})
+    task_id = responce.json()['id']
+    etag = (await client.get(f'/user/tasks/{task_id}', headers=auth_header)).headers['ETag']
+    await client.delete(f'/user/tasks/{task_id}', headers=auth_header)
+    responce = await client.post('/user/tasks/', headers=auth_header, json={'title': 'reused_id_again'})
+    assert responce.json()['id'] == task_id
+
+    responce = await client.get(f'/user/tasks/{task_id}', headers={**auth_header, 'If-None-Match': etag})
+    assert responce.status_code == 200 and responce.json()['title'] == 'reused_id_again'
+    await client.delete(f'/user/tasks/{task_id}', headers=auth_header)
+
+@pytest.mark.asyncio
+async def test_get_tasks_list_etag(client, auth_header, test_tasks_list, sql_statements):
+    responce = await client.get('/user/tasks/?sort=priority', headers=auth_header)
+    etag = responce.headers['ETag']
+    assert (await client.get('/user/tasks/?sort=title', headers=auth_header)).headers['ETag'] != etag
+
+    # A 304 is answered from the users row, without reading any task
+    sql_statements.clear()
+    responce = await client.get('/user/tasks/?sort=priority', headers={**auth_header, 'If-None-Match': etag})
+    assert responce.status_code == 304 and responce.content == b''
+    assert [statement.split()[1] for statement in sql_statements] == ['users.tasks_version']
+
+    # Every kind of task write changes the tag
+    responce = await client.post('/user/tasks/', headers=auth_header, json={'title': 'etag_task'})
+    task_id = responce.json()['id']
+    writes = [
+        lambda: client.put(f'/user/tasks/{task_id}', headers=auth_header, json={'done': True}),
+        lambda: client.post('/user/tasks/batch', headers=auth_header,
+                            json={'operations': [{'op': 'update', 'id': task_id, 'data': {'priority': 2}}]}),
+        lambda: client.delete(f'/user/tasks/{task_id}', headers=auth_header),
+    ]
+    for write in [None, *writes]:
+        if write:
+            await write()
+        responce = await client.get('/user/tasks/?sort=priority', headers={**auth_header, 'If-None-Match': etag})
+        assert responce.status_code == 200
+        assert responce.headers['ETag'] != etag
+        etag = responce.headers['ETag']
+
+    # overdue changes with the clock, not with writes
+    responce = await client.get('/user/tasks/?overdue=true', headers=auth_header)
+    assert responce.status_code == 200 and 'ETag' not in responce.headers
+
+@pytest.mark.asyncio
+async def test_get_task_changes(client, auth_header, test_user, session, sql_statements):
+    # SQLite does not cascade the deletes of earlier test users, whose ids get reused
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.execute(delete(TaskTombstone).where(TaskTombstone.owner_id==test_user.id))
+    await session.commit()
+
+    ids = []
+    for i in range(3):
+        responce = await client.post('/user/tasks/', headers=auth_header, json={'title': f'synced_{i}'})
+        ids.append(responce.json()['id'])
+
+    # Full sync, in pages
+    responce = await client.get('/user/tasks/changes?limit=2', headers=auth_header)
+    assert responce.status_code == 200
+    page = responce.json()
+    assert [task['id'] for task in page['changed']] == ids[:2] and page['has_more'] is True
+    page = (await client.get('/user/tasks/changes', params={'since': page['next'], 'limit': 2}, headers=auth_header)).json()
+    assert [task['id'] for task in page['changed']] == ids[2:] and page['deleted'] == [] and page['has_more'] is False
+    token = page['next']
+
+    # Nothing changed: the users row is all that is read
+    sql_statements.clear()
+    page = (await client.get('/user/tasks/changes', params={'since': token}, headers=auth_header)).json()
+    assert page == {'changed': [], 'deleted': [], 'next': token, 'has_more': False}
+    assert [statement.split()[1] for statement in sql_statements] == ['users.tasks_version,']
+
+    await client.put(f'/user/tasks/{ids[1]}', headers=auth_header, json={'done': True})
+    await client.delete(f'/user/tasks/{ids[0]}', headers=auth_header)
+    responce = await client.post('/user/tasks/batch', headers=auth_header, json={'operations': [
+        {'op': 'create', 'data': {'title': 'synced_batch'}},
+        {'op': 'update', 'id': ids[2], 'data': {'title': 'synced_renamed'}},
+        {'op': 'delete', 'id': ids[1]},
+    ]})
+    batch_id = responce.json()['results'][0]['id']
+
+    page = (await client.get('/user/tasks/changes', params={'since': token}, headers=auth_header)).json()
+    assert [(task['id'], task['title']) for task in page['changed']] == [(batch_id, 'synced_batch'), (ids[2], 'synced_renamed')]
+    assert page['deleted'] == [ids[0], ids[1]] and page['has_more'] is False
+    token = page['next']
+
+    responce = await client.get('/user/tasks/changes', params={'since': 'not-a-token'}, headers=auth_header)
+    assert responce.status_code == 422
+
+    # Tombstones older than the token are fine to drop; tokens older than the tombstones get 410
+    ids.append((await client.post('/user/tasks/', headers=auth_header, json={'title': 'synced_3'})).json()['id'])
+    await client.delete(f'/user/tasks/{batch_id}', headers=auth_header)
+    assert await crud.compact_task_tombstones(session, datetime.now() + timedelta(days=1)) >= 3
+    responce = await client.get('/user/tasks/changes', params={'since': token}, headers=auth_header)
+    assert responce.status_code == 410
+
+    # A paged full sync does not read tombstones, so its pages never expire
+    ids.append((await client.post('/user/tasks/', headers=auth_header, json={'title': 'synced_4'})).json()['id'])
+    page = (await client.get('/user/tasks/changes?limit=2', headers=auth_header)).json()
+    assert [task['id'] for task in page['changed']] == [ids[2], ids[3]] and page['has_more'] is True
+    # It ends at the version it started from, so a delete while it is paged arrives by delta sync
+    await client.delete(f'/user/tasks/{ids[2]}', headers=auth_header)
+    responce = await client.get('/user/tasks/changes', params={'since': page['next'], 'limit': 2}, headers=auth_header)
+    assert responce.status_code == 200
+    page = responce.json()
+    assert [task['id'] for task in page['changed']] == [ids[4]] and page['has_more'] is False
+    page = (await client.get('/user/tasks/changes', params={'since': page['next']}, headers=auth_header)).json()
+    assert page['changed'] == [] and page['deleted'] == [ids[2]]
+
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.commit()
+
+
+class WriteBetweenReads:
+    """A session that lets another write land right after the tasks are read."""
+
+    def __init__(self, session, write):
+        self._session = session
+        self._write = write
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def scalars(self, *args, **kwargs):
+        tasks = (await self._session.scalars(*args, **kwargs)).all()
+        await self._write()
+        return tasks
+
+
+@pytest.mark.asyncio
+async def test_get_task_changes_with_write_between_reads(client, auth_header, test_user, session):
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.execute(delete(TaskTombstone).where(TaskTombstone.owner_id==test_user.id))
+    await session.commit()
+
+    ids = []
+    for i in range(2):
+        responce = await client.post('/user/tasks/', headers=auth_header, json={'title': f'interleaved_{i}'})
+        ids.append(responce.json()['id'])
+    token = (await client.get('/user/tasks/changes', headers=auth_header)).json()['next']
+    await client.put(f'/user/tasks/{ids[0]}', headers=auth_header, json={'done': True})
+
+    async def write():
+        await crud.update_task(session, ids[1], {'done': True}, test_user.id)
+        await crud.delete_task(session, ids[0], test_user.id)
+
+    # The update lands after the tasks were read and the delete before the tombstones are:
+    # neither is returned, and the token does not move past them.
+    page = await crud.get_task_changes(WriteBetweenReads(session, write), test_user.id, token, limit=10)
+    assert [task.id for task in page['changed']] == [ids[0]] and page['deleted'] == []
+
+    page = (await client.get('/user/tasks/changes', params={'since': page['next']}, headers=auth_header)).json()
+    assert [task['id'] for task in page['changed']] == [ids[1]] and page['deleted'] == [ids[0]]
+
+    await session.execute(delete(Task).where(Task.owner_id==test_user.id))
+    await session.commit()
@@ -3,6 +3,7 @@ from sqlalchemy import select
 
 from app.database.models import User
 from app.security.security import create_access_token, verify_password
+from app.core.cache import user_cache
 import copy
 
 @pytest.mark.asyncio 
@@ -50,3 +51,18 @@ async def test_delete_user(client, session):
     assert responce.status_code == 204
     del_user = await session.scalar(select(User).where(User.id == user.id))
     assert del_user is None
+
+@pytest.mark.asyncio
+async def test_user_cache_invalidation(client, test_user, auth_header):
+    await client.get('/users/me', headers=auth_header)
+    hits = user_cache.stats()['hits']
+    responce = await client.get('/users/me', headers=auth_header)
+    assert responce.json()['username'] == test_user.username
+    assert user_cache.stats()['hits'] == hits + 1
+
+    payload = {'username': 'cached_user', 'email': 'cached_user@example.com', 'password': 'password'}
+    responce = await client.put('/users/me', headers=auth_header, json=payload)
+    assert responce.status_code == 200
+
+    responce = await client.get('/users/me', headers=auth_header)
+    assert responce.json()['username'] == 'cached_user'